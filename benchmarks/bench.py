@@ -0,0 +1,204 @@
+# Benchmarks for the encoder, the decoder, the Serpent cipher and how long it takes to start
+# Runs offline and prints the results as JSON (or writes them to a file with -o), so they can be compared between
+# versions. Every number is the best of a few runs.
+#   $ py benchmarks/bench.py -o results.json
+#   $ py benchmarks/bench.py --quick
+
+import compileall
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from numpy.fft import rfft
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import fef
+from fef import encoder, serpent
+from fef.encoder import encode_chunk, records_size
+from fef.container import CODING_HALF, KDF_ITERATIONS, SALT_SIZE, derive_key
+
+SIZES = [1 << 16, 1 << 20, 8 << 20] # input sizes for encoding and decoding (bytes)
+QUICK_SIZES = [1 << 16, 1 << 20]
+SECTION_SIZES = [64, 1024, "auto"]
+PASSWORD_SIZE = 1 << 20 # encryption is still slower, so it only gets one input size
+BENCH_KDF_ITERATIONS = 1 # PBKDF2 iterations of the encrypted codec runs, so they measure counter mode and not the key
+#                          derivation (which gets its own result with the real number of iterations)
+BATCH_SIZE = 1 << 20 # bytes encrypted per call of serpent.encrypt_blocks
+IMPORT_BUDGET = 30000 # microseconds "import fef" may take (numpy alone takes several times that, so this mostly catches
+#                       something heavy being imported up front again)
+KEY = bytes(range(32))
+BLOCK = bytes(range(16))
+
+# =====================================================================================================================
+
+def best_time(function, repeat):
+	# Shortest time out of repeat runs of function (the one with the least noise from everything else)
+	best = None
+	for i in range(repeat):
+		start = time.perf_counter()
+		function()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+def mb_per_s(size, seconds):
+	return round(size / seconds / (1 << 20), 3)
+
+def bench_codec(sizes, repeat):
+	# MB/s (of original bytes) for encode, decode and stream decode, the same paths encode.py and decode.py use
+	# Encrypted containers are written with BENCH_KDF_ITERATIONS (recorded as kdf_iterations), bench_kdf has the rest
+	results = []
+	rng = random.Random(0)
+	cases = [(size, section_size, None) for size in sizes for section_size in SECTION_SIZES]
+	cases.append((PASSWORD_SIZE, 64, "benchmark"))
+	for size, section_size, password in cases:
+		data = rng.randbytes(size)
+		common = {"size": size, "section_size": section_size, "encrypted": not password is None}
+		if not password is None:
+			encoder.KDF_ITERATIONS = BENCH_KDF_ITERATIONS
+			common["kdf_iterations"] = BENCH_KDF_ITERATIONS
+		container = fef.encode([("data", data)], password=password, section_size=section_size)
+		
+		seconds = best_time(lambda: fef.encode([("data", data)], password=password, section_size=section_size), repeat)
+		results.append(dict(name="encode", mb_per_s=mb_per_s(size, seconds), **common))
+		seconds = best_time(lambda: fef.decode(container, password=password), repeat)
+		results.append(dict(name="decode", mb_per_s=mb_per_s(size, seconds), **common))
+		seconds = best_time(lambda: fef.decode(io.BytesIO(container), password=password, stream=True), repeat)
+		results.append(dict(name="decode_stream", mb_per_s=mb_per_s(size, seconds), **common))
+		seconds = best_time(lambda: fef.verify(container, password=password), repeat)
+		results.append(dict(name="verify", mb_per_s=mb_per_s(size, seconds), **common))
+		encoder.KDF_ITERATIONS = KDF_ITERATIONS
+	return results
+
+def bench_kdf(repeat):
+	# Seconds it takes to derive the key of an encrypted container (once per container when encoding or decoding)
+	salt = bytes(SALT_SIZE)
+	seconds = best_time(lambda: derive_key("benchmark", salt, KDF_ITERATIONS), repeat)
+	return [{"name": "derive_key", "seconds": round(seconds, 4), "kdf_iterations": KDF_ITERATIONS}]
+
+def bench_batching(repeat):
+	# MB/s of the transform alone: one rfft per section against every section of a chunk at once
+	results = []
+	data = np.frombuffer(random.Random(1).randbytes(1 << 20), dtype=np.int8)
+	for section_size in (64, 1024):
+		sections = data.reshape(-1, section_size)
+		seconds = best_time(lambda: [rfft(section) for section in sections], repeat)
+		results.append({"name": "rfft_per_section", "size": len(data), "section_size": section_size, "mb_per_s": mb_per_s(len(data), seconds)})
+		seconds = best_time(lambda: rfft(sections, axis=1), repeat)
+		results.append({"name": "rfft_batched", "size": len(data), "section_size": section_size, "mb_per_s": mb_per_s(len(data), seconds)})
+		
+		records = np.empty(records_size(len(data), section_size, CODING_HALF), dtype=np.uint8)
+		seconds = best_time(lambda: encode_chunk(data, section_size, CODING_HALF, records), repeat)
+		results.append({"name": "encode_chunk", "size": len(data), "section_size": section_size, "mb_per_s": mb_per_s(len(data), seconds)})
+	return results
+
+def bench_serpent(quick):
+	# Blocks (or key schedules) per second, the reference bitstring implementation against the word and packed engines
+	cipher_text = serpent.encrypt_block(BLOCK, serpent.expand_key(KEY))
+	key = serpent.SerpentKey(KEY)
+	words = serpent.block_words(BLOCK)
+	cipher_words = serpent.block_words(cipher_text)
+	key_bitstring = serpent.str_bitstring(KEY, 256)
+	reference_count = 2 if quick else 10
+	fast_count = 2000 if quick else 20000
+	cases = [
+		("encrypt", "reference", lambda: serpent.encrypt_reference(BLOCK, KEY), reference_count),
+		("decrypt", "reference", lambda: serpent.decrypt_reference(cipher_text, KEY), reference_count),
+		("make_subkeys", "reference", lambda: serpent.make_subkeys(key_bitstring), reference_count),
+		("encrypt", "words", lambda: serpent.encrypt_words(words, key.k_hat), fast_count),
+		("decrypt", "words", lambda: serpent.decrypt_words(cipher_words, key.k_hat), fast_count),
+		("make_subkeys", "words", lambda: serpent.make_subkey_words(KEY), fast_count // 10),
+		("encrypt", "packed", lambda: serpent.encrypt_block(BLOCK, key), fast_count),
+		("decrypt", "packed", lambda: serpent.decrypt_block(cipher_text, key), fast_count),
+		("encrypt_with_key_schedule", "packed", lambda: serpent.encrypt_block(BLOCK, serpent.SerpentKey(KEY)), fast_count // 10),
+	]
+	results = []
+	for name, engine, function, count in cases:
+		seconds = best_time(lambda: [function() for i in range(count)], 3)
+		results.append({"name": "serpent_" + name, "engine": engine, "per_s": round(count / seconds, 1)})
+	
+	# Batches go through a whole buffer per call, so they get MB/s (and blocks per second to compare with the above)
+	data = random.Random(2).randbytes(BATCH_SIZE)
+	for name, function in (("encrypt", serpent.encrypt_blocks), ("decrypt", serpent.decrypt_blocks)):
+		seconds = best_time(lambda: function(data, key), 3)
+		results.append({"name": "serpent_" + name, "engine": "batched", "per_s": round(len(data) / 16 / seconds, 1), "mb_per_s": mb_per_s(len(data), seconds)})
+	return results
+
+def import_time(code):
+	# Microseconds python -X importtime says importing fef took while running code, in a fresh process
+	result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+	for line in result.stderr.splitlines():
+		parts = line.split("|")
+		if len(parts) == 3 and parts[2].strip() == "fef":
+			return int(parts[1])
+	return None
+
+def bench_startup(repeat):
+	# How long a fresh process takes to import fef and to run decode.py -l on a tiny container, against the budget
+	# Everything is compiled first, otherwise a run without .pyc files (e.g. PYTHONDONTWRITEBYTECODE) measures compiling
+	compileall.compile_dir(os.path.join(ROOT, "fef"), quiet=1)
+	results = []
+	us = min(import_time("import fef") for i in range(repeat))
+	imports_numpy = subprocess.run([sys.executable, "-c", "import sys, fef; print('numpy' in sys.modules)"], cwd=ROOT, capture_output=True, text=True).stdout.strip() == "True"
+	results.append({"name": "import_fef", "us": us, "budget_us": IMPORT_BUDGET, "within_budget": us <= IMPORT_BUDGET, "imports_numpy": imports_numpy})
+	if us > IMPORT_BUDGET or imports_numpy:
+		print("WARNING: import fef took " + str(us) + " us (budget " + str(IMPORT_BUDGET) + " us)" + (", numpy was imported" if imports_numpy else ""), file=sys.stderr)
+	
+	with tempfile.TemporaryDirectory() as folder:
+		container = os.path.join(folder, "small.fef")
+		fef.encode([("small.txt", b"a small file\n")], container)
+		seconds = best_time(lambda: subprocess.run([sys.executable, "-c", "pass"], check=True), repeat)
+		results.append({"name": "python_startup", "seconds": round(seconds, 4)})
+		cli = [sys.executable, os.path.join(ROOT, "decode.py"), "-i", container, "-l"]
+		seconds = best_time(lambda: subprocess.run(cli, check=True, capture_output=True), repeat)
+		results.append({"name": "cli_list", "seconds": round(seconds, 4)})
+	return results
+
+def run(quick=False):
+	# Returns every result along with what they were measured on
+	repeat = 2 if quick else 5
+	return {
+		"fef_version": fef.VERSION,
+		"python": platform.python_version(),
+		"numpy": np.__version__,
+		"machine": platform.machine(),
+		"cpus": os.cpu_count(),
+		"results": bench_startup(repeat) + bench_codec(QUICK_SIZES if quick else SIZES, repeat) + bench_kdf(repeat) + bench_batching(repeat) + bench_serpent(quick),
+	}
+
+# =====================================================================================================================
+
+def main():
+	output_file = ""
+	quick = False # smaller inputs and fewer runs
+	
+	last_flag = ""
+	for arg in sys.argv[1:]:
+		if arg == "-o" or arg == "--output":
+			last_flag = "-o"
+		elif arg == "-q" or arg == "--quick":
+			quick = True
+		elif last_flag == "-o":
+			output_file = arg
+			last_flag = ""
+		else:
+			print("WARNING: Unknown argument provided (" + arg + ")! Ignoring", file=sys.stderr)
+	
+	results = json.dumps(run(quick), indent=2)
+	if output_file == "":
+		print(results)
+	else:
+		with open(output_file, "w") as f:
+			f.write(results + "\n")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,178 @@
+# Checks every Serpent engine against the known-answer vectors in serpent_kat.txt and against each other on random keys
+# and blocks (a differential fuzzer), so a faster engine can't quietly give different output
+#   $ py benchmarks/serpent_check.py
+#   $ py benchmarks/serpent_check.py -n 200 -s 1234
+# -n is the number of random cases run through the (slow) reference implementation, the fast engines get 100 times as
+# many against each other. Exits with an error if anything doesn't match.
+
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fef import serpent
+
+KAT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serpent_kat.txt")
+
+# =====================================================================================================================
+
+# Engines
+# Every engine has encrypt(block, key), decrypt(block, key) and subkeys(key), which returns the 33 round keys as tuples
+# of 4 words (the same form as serpent.make_subkey_words)
+
+def reference_subkeys(key):
+	# make_subkeys gives bitstrings after the initial permutation, so that is undone and the bits are put into words
+	words = []
+	for k in serpent.make_subkeys(serpent.str_bitstring(key, 256)):
+		k = serpent.ip_inverse(k)
+		words.append(tuple(serpent.reverse_bitstring(k[32*i : 32*(i+1)]) for i in range(4)))
+	return words
+
+def packed_subkeys(key):
+	# The packed round keys have the initial permutation applied, which the final permutation undoes
+	return [struct.unpack("<4I", serpent.packed_block(k)) for k in serpent.SerpentKey(key).k_packed]
+
+def words_bytes(words):
+	return struct.pack("<4I", *words)
+
+ENGINES = {
+	"reference": (
+		lambda block, key: bytes(serpent.encrypt_reference(block, key)),
+		lambda block, key: bytes(serpent.decrypt_reference(block, key)),
+		reference_subkeys,
+	),
+	"words": (
+		lambda block, key: words_bytes(serpent.encrypt_words(serpent.block_words(block), serpent.SerpentKey(key).k_hat)),
+		lambda block, key: words_bytes(serpent.decrypt_words(serpent.block_words(block), serpent.SerpentKey(key).k_hat)),
+		lambda key: serpent.make_subkey_words(serpent.key_bytes(key)),
+	),
+	"packed": (
+		lambda block, key: bytes(serpent.encrypt_block(block, serpent.SerpentKey(key))),
+		lambda block, key: bytes(serpent.decrypt_block(block, serpent.SerpentKey(key))),
+		packed_subkeys,
+	),
+	"cached": (
+		lambda block, key: bytes(serpent.encrypt(block, key)),
+		lambda block, key: bytes(serpent.decrypt(block, key)),
+		lambda key: serpent.expand_key(key).k_hat,
+	),
+	# Given no bytes this gives no blocks instead of one block of padding, so the block is padded first
+	"batched": (
+		lambda block, key: serpent.encrypt_blocks(block.ljust(16, b"\x00"), key),
+		lambda block, key: serpent.decrypt_blocks(block.ljust(16, b"\x00"), key),
+		lambda key: serpent.expand_key(key).k_hat,
+	),
+}
+
+# =====================================================================================================================
+
+def load_vectors(path=KAT_FILE):
+	# (key, plaintext, ciphertext) for every line that isn't empty or a comment
+	vectors = []
+	with open(path) as f:
+		for line in f:
+			line = line.strip()
+			if line == "" or line.startswith("#"):
+				continue
+			key, plain_text, cipher_text = line.split()
+			vectors.append((bytes.fromhex(key), bytes.fromhex(plain_text), bytes.fromhex(cipher_text)))
+	return vectors
+
+def check_vectors(vectors, engines, errors):
+	for name, (encrypt, decrypt, subkeys) in engines.items():
+		for key, plain_text, cipher_text in vectors:
+			if not encrypt(plain_text, key) == cipher_text:
+				errors.append(name + ": encrypt " + plain_text.hex() + " with key " + key.hex() + " doesn't give " + cipher_text.hex())
+			if not decrypt(cipher_text, key) == plain_text:
+				errors.append(name + ": decrypt " + cipher_text.hex() + " with key " + key.hex() + " doesn't give " + plain_text.hex())
+
+def random_case(rng):
+	# Keys and blocks of every length the engines take (short ones get padded, key bytes past 32 are never used)
+	key = rng.randbytes(rng.choice([32, 32, 32, rng.randrange(0, 41)]))
+	block = rng.randbytes(rng.choice([16, 16, 16, rng.randrange(0, 17)]))
+	return key, block
+
+def fuzz(rng, count, engines, errors):
+	# Runs count random cases through every engine and compares everything against the first one
+	names = list(engines)
+	for i in range(count):
+		key, block = random_case(rng)
+		results = dict()
+		for name in names:
+			encrypt, decrypt, subkeys = engines[name]
+			results[name] = (encrypt(block, key), decrypt(block, key), [tuple(k) for k in subkeys(key)])
+		
+		for name in names[1:]:
+			for what, expected, got in zip(("encrypt", "decrypt", "subkeys"), results[names[0]], results[name]):
+				if not expected == got:
+					errors.append(name + " and " + names[0] + ": " + what + " of " + block.hex() + " with key " + key.hex() + " differ")
+		
+		# Decrypting has to give back the (padded) block
+		if not engines[names[0]][1](results[names[0]][0], key) == block.ljust(16, b"\x00"):
+			errors.append(names[0] + ": decrypt doesn't undo encrypt for " + block.hex() + " with key " + key.hex())
+
+def check_batches(rng, count, errors):
+	# The batched engine has to give the same blocks as encrypting them one by one, for any number of them (including
+	# more than one batch)
+	for i in range(count):
+		key = rng.randbytes(32)
+		n = rng.choice([0, 1, 2, rng.randrange(1, 100), serpent.BATCH_BLOCKS + rng.randrange(1, 100)])
+		data = rng.randbytes(16 * n)
+		k = serpent.expand_key(key)
+		for what, batched, single in (("encrypt", serpent.encrypt_blocks, serpent.encrypt_block), ("decrypt", serpent.decrypt_blocks, serpent.decrypt_block)):
+			expected = b"".join(bytes(single(data[j : j+16], k)) for j in range(0, len(data), 16))
+			if not batched(data, key) == expected:
+				errors.append("batched: " + what + " of " + str(n) + " blocks with key " + key.hex() + " differs from one block at a time")
+
+# =====================================================================================================================
+
+def main():
+	count = 20
+	seed = None
+	
+	last_flag = ""
+	for arg in sys.argv[1:]:
+		if arg == "-n" or arg == "--count":
+			last_flag = "-n"
+		elif arg == "-s" or arg == "--seed":
+			last_flag = "-s"
+		elif last_flag == "-n" and arg.isdigit():
+			count = int(arg)
+			last_flag = ""
+		elif last_flag == "-s" and arg.isdigit():
+			seed = int(arg)
+			last_flag = ""
+		else:
+			print("WARNING: Unknown argument provided (" + arg + ")! Ignoring")
+	
+	if seed is None:
+		seed = random.randrange(1 << 32)
+	print("Seed: " + str(seed))
+	rng = random.Random(seed)
+	errors = []
+	
+	start = time.perf_counter()
+	vectors = load_vectors()
+	check_vectors(vectors, ENGINES, errors)
+	print("Checked " + str(len(vectors)) + " known-answer vectors on " + str(len(ENGINES)) + " engines")
+	
+	fuzz(rng, count, ENGINES, errors)
+	fast = {name: engine for name, engine in ENGINES.items() if not name == "reference"}
+	fuzz(rng, count * 100, fast, errors)
+	print("Compared " + str(count) + " random cases on every engine and " + str(count * 100) + " more on the fast ones")
+	check_batches(rng, max(count // 10, 2), errors)
+	print("Compared batches of blocks against one block at a time")
+	print("Took " + str(round(time.perf_counter() - start, 2)) + "s")
+	
+	for error in errors[:20]:
+		print("ERROR: " + error)
+	if len(errors) > 0:
+		print("ERROR: " + str(len(errors)) + " mismatch(es)!")
+		exit(1)
+	print("Everything matches")
+
+if __name__ == "__main__":
+	main()
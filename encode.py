@@ -1,161 +1,92 @@
-from numpy.fft import ifft
 import os
-import struct
 import sys
 
-import serpent
+import fef
 
-input_files = list()
-output_file = ""
-size = 64 # this may need to be able to change
-password = ""
-
-# Parse args
-if len(sys.argv) <= 1:
-	print("No arguments provided!")
-	exit(1)
-
-last_flag = ""
-for arg in sys.argv:
-	if arg == "encode.py":
-		continue
-	# Look for flags
-	if arg == "-i" or arg == "--input":
-		last_flag = "-i"
-	elif arg == "-o" or arg == "--output":
-		last_flag = "-o"
-	elif arg == "-p" or arg == "--password":
-		last_flag = "-p"
-	else:
-	# Do stuff with flags
-		# Input file(s)
-		if last_flag == "-i":
-			# Check if file can be accessed, warn user if not
-			if os.access(arg, os.R_OK):
-				input_files.append(arg)
-			else:
-				print("WARNING: " + arg + " is not a file that can be accessed! Ignoring")
-		# Output file
-		elif last_flag == "-o":
-			# Check to make sure we don't already have an output file
-			if output_file == "":
-				output_file = arg
-				last_flag = ""
-			else:
-				print("WARNING: extra output file provided (" + arg + ")! Ignoring")
-		# Password information
-		elif last_flag == "-p":
-			# Create/add to password (password can be multiple words/have spaces)
-			password += ("" if password == "" else " ") + arg
-
-if len(input_files) == 0:
-	print("ERROR: no input files provided!")
-	exit(1)
-if output_file == "":
-	print("WARNING: no output file provided! Defaulting to output.fef")
-
-# This list will contain the complex data of every file in order
-complex_data = list()
-
-# Encode files
-print("Parsing files")
-for file in input_files:
-	byte_sections = list()
+def main():
+	input_files = list()
+	output_file = ""
+	size = fef.SECTION_SIZE # number of bytes per section, or "auto"
+	password = ""
+	jobs = 1 # number of processes encoding at the same time
+	quantize = False # store coefficients as integers instead of floats
 	
-	# Create int arrays
-	i = 0
-	try:
-		with open(file, "rb") as f:
-			while (byte := f.read(1)):
-				if i == 0:
-					byte_sections.append(list())
-				i += 1
-				i %= size
-				
-				byte_sections[-1].append(int.from_bytes(byte, byteorder="big", signed=True))
-	except:
-		# We shouldn't be here unless file access was manipulated between reads or os.access failed for some reason
-		print("ERROR: Cannot open file " + str(file) + "!")
+	# Parse args
+	if len(sys.argv) <= 1:
+		print("No arguments provided!")
 		exit(1)
-
-	# Convert to fourier series
-	complex_sections = list()
-	for ls in byte_sections:
-		complex_sections.append(ifft(ls))
 	
-	# Add to list for encoding
-	complex_data.append(complex_sections)
-
-# Convert to file
-output = open(output_file if not output_file == "" else "output.fef", "wb")
-
-print("Writing file")
-
-# Write file header (FEF, version, and encryption flag)
-# Current version is 0x04
-output.write(b"FEF\x04" + (b"\x00" if password == "" else b"\x01"))
-for i, sections in enumerate(complex_data):
-	# Write file flag
-	output.write(b"F") # File start
-	
-	# Write file name
-	output.write(b"N") # Name of file
-	output.write(bytearray(input_files[i], encoding="UTF-8"))
-	output.write(b"\x00") # null
-	
-	# Write length of all sections
-	output.write(b"L") # Length of section array (number of sections)
-	output.write(bytearray(struct.pack(">I", len(sections))))
-	output.write(b"S") # Start of sections
-	
-	# Write sections
-	for arr in sections:
-		# Write length of section
-		output.write(b"l") # length of section
-		output.write(bytearray(struct.pack(">I", len(arr))))
-		output.write(b"s") # start of start
-		
-		# Write section
-		for num in arr:
-			real = struct.pack(">e", float(num.real))
-			imag = struct.pack(">e", float(num.imag))
-			output.write(bytearray(real))
-			output.write(bytearray(imag))
-
-output.write(b"E") # End of file
-output.close()
-
-# Encryption
-if not password == "":
-	print("Encrypting file")
-	# Reopen file and dump binary content into bytearray
-	file_bytes = bytearray()
-	with open(output_file if not output_file == "" else "output.fef", "rb") as f:
-		while (byte := f.read(1)):
-			file_bytes.append(byte[0])
+	last_flag = ""
+	for arg in sys.argv:
+		if arg == "encode.py":
+			continue
+		# Look for flags
+		if arg == "-i" or arg == "--input":
+			last_flag = "-i"
+		elif arg == "-o" or arg == "--output":
+			last_flag = "-o"
+		elif arg == "-p" or arg == "--password":
+			last_flag = "-p"
+		elif arg == "-j" or arg == "--jobs":
+			last_flag = "-j"
+		elif arg == "-z" or arg == "--size":
+			last_flag = "-z"
+		elif arg == "-q" or arg == "--quantize":
+			quantize = True
+		else:
+		# Do stuff with flags
+			# Input file(s)
+			if last_flag == "-i":
+				# Check if file can be accessed, warn user if not
+				if os.access(arg, os.R_OK):
+					input_files.append(arg)
+				else:
+					print("WARNING: " + arg + " is not a file that can be accessed! Ignoring")
+			# Output file
+			elif last_flag == "-o":
+				# Check to make sure we don't already have an output file
+				if output_file == "":
+					output_file = arg
+					last_flag = ""
+				else:
+					print("WARNING: extra output file provided (" + arg + ")! Ignoring")
+			# Password information
+			elif last_flag == "-p":
+				# Create/add to password (password can be multiple words/have spaces)
+				password += ("" if password == "" else " ") + arg
+			# Number of jobs (0 is one per CPU)
+			elif last_flag == "-j":
+				if arg.isdigit():
+					jobs = int(arg)
+				else:
+					print("WARNING: invalid number of jobs (" + arg + ")! Ignoring")
+				last_flag = ""
+			# Section size
+			elif last_flag == "-z":
+				if arg.isdigit() and 0 < int(arg) <= fef.MAX_SECTION_SIZE:
+					size = int(arg)
+				elif arg == "auto":
+					size = arg
+				else:
+					print("WARNING: invalid section size (" + arg + ")! Ignoring")
+				last_flag = ""
 	
-	# Encrypt 16 bytes (128 bits) at a time with 32 bytes (256 bits) of repeated key at a time
-	key_o = 0 # key offset
-	out_bytes = file_bytes[0:5]
-	for i in range(5, len(file_bytes), 16):
-		print(str(round(i / len(file_bytes) * 100, 2)) + "% ", end="\r")
-		# Get section to encode
-		to_encrypt = file_bytes[i : min(i+16, len(file_bytes))]
-		
-		# Figure out key
-		key = ""
-		for j in range(32):
-			key += password[(key_o + j) % len(password)]
-		key_o = (key_o + (32 % len(password))) % len(password)
-		
-		# Encryption woo
-		out_bytes += serpent.encrypt(to_encrypt, key_o)
+	if len(input_files) == 0:
+		print("ERROR: no input files provided!")
+		exit(1)
+	if output_file == "":
+		print("WARNING: no output file provided! Defaulting to output.fef")
 	
-	print("100.0%") # erase uneven percent (since it doesn't end on 100)
+	# Encode files
+	output_file = output_file if not output_file == "" else "output.fef"
+	try:
+		fef.encode(input_files, output_file, password=password if not password == "" else None, section_size=size, quantize=quantize, jobs=jobs, log=print)
+	except fef.FEFError as e:
+		print("ERROR: " + str(e))
+		exit(1)
 	
-	# Write encrypted output
-	output = open(output_file if not output_file == "" else "output.fef", "wb")
-	output.write(out_bytes)
-	output.close()
+	print("Done")
 
-print("Done")
+# Only run when started as a script (process pool workers import this file too on some platforms)
+if __name__ == "__main__":
+	main()
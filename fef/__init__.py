@@ -0,0 +1,12 @@
+# Fourier-Encoded Files
+# encode() packs files into a FEF container and decode() unpacks one, see fef/encoder.py and fef/decoder.py
+# list_files() and extract() use the index at the end of the container to look at single files
+# verify() checks every section against its checksum without writing anything
+
+from .container import VERSION, DecodeFailed, FEFError, IndexEntry, PasswordRequired
+from .decoder import BadSection, decode, extract, list_files, verify
+from .encoder import MAX_SECTION_SIZE, SECTION_SIZE, encode
+
+# Longer names for the same functions
+encode_files = encode
+decode_archive = decode
@@ -0,0 +1,156 @@
+# asyncio front end for serving many encode/decode jobs from one long-lived process
+#   service = fef.aio.Service(workers=4, concurrency=32)
+#   container = await service.encode([("notes.txt", b"some bytes")], password="hunter2")
+#   files = await service.decode(container, password="hunter2")
+# or the same through fef.aio.encode() and fef.aio.decode(), which share one default Service.
+# Reading inputs and writing outputs happens in threads, the fft and Serpent work (fef.encode and fef.decode on bytes)
+# in a process pool shared by every job, so the event loop never waits on either. At most concurrency jobs run at the
+# same time; the rest wait in encode()/decode() until there is room, which is what keeps memory (every running job has
+# its inputs and outputs in memory) and the pool's queue bounded however many jobs come in.
+
+import asyncio
+import concurrent.futures
+import os
+
+from . import decoder, encoder
+from .container import DecodeFailed, FEFError
+from .encoder import SECTION_SIZE
+
+CONCURRENCY = 16 # jobs running at the same time by default
+
+# =====================================================================================================================
+
+class Service:
+	# A process pool and a limit on how many jobs run at the same time
+	#   workers: number of processes (None uses every CPU)
+	#   concurrency: number of jobs that are read, transformed and written at the same time, the rest wait their turn
+	def __init__(self, workers=None, concurrency=CONCURRENCY):
+		if concurrency < 1:
+			raise FEFError("Invalid concurrency (" + str(concurrency) + ")! It has to be at least 1")
+		self.pool = concurrent.futures.ProcessPoolExecutor(workers)
+		self.concurrency = concurrency
+		self.semaphore = None # made on first use, so it belongs to the event loop that uses it
+	
+	async def __aenter__(self):
+		return self
+	
+	async def __aexit__(self, *args):
+		await self.close()
+	
+	async def close(self):
+		# Waits for running jobs and stops the processes
+		await asyncio.to_thread(self.pool.shutdown)
+	
+	# Same as fef.encode (see fef/encoder.py), except that file objects are read completely before encoding
+	async def encode(self, inputs, out=None, password=None, section_size=SECTION_SIZE, quantize=False, log=None):
+		async with self._slot():
+			items = await asyncio.to_thread(_read_inputs, inputs)
+			container = await self._run(encoder.encode, log, items, None, password, section_size, quantize)
+			if out is None:
+				return container
+			await asyncio.to_thread(_write_output, out, container)
+	
+	# Same as fef.decode (see fef/decoder.py), except that file objects are read completely before decoding (so there is
+	# no stream mode)
+	async def decode(self, src, out_dir=None, password=None, log=None):
+		async with self._slot():
+			data = await asyncio.to_thread(_read_source, src)
+			failed = []
+			try:
+				files = await self._run(decoder.decode, log, data, None, password)
+			except DecodeFailed as e:
+				if out_dir is None:
+					raise
+				files, failed = e.files, e.failed # the files that did come out are still written
+			if out_dir is None:
+				return files
+			return await asyncio.to_thread(_write_files, out_dir, files, failed)
+	
+	def _slot(self):
+		if self.semaphore is None:
+			self.semaphore = asyncio.Semaphore(self.concurrency)
+		return self.semaphore
+	
+	async def _run(self, function, log, *args):
+		# Runs function in the pool, messages it logs there are passed on to log here once it is done
+		loop = asyncio.get_running_loop()
+		result, messages = await loop.run_in_executor(self.pool, _logged, function, *args)
+		for message in messages:
+			(log or _quiet)(message)
+		return result
+
+# =====================================================================================================================
+
+_default = None # Service used by encode() and decode()
+
+def default_service():
+	global _default
+	if _default is None:
+		_default = Service()
+	return _default
+
+async def encode(inputs, out=None, password=None, section_size=SECTION_SIZE, quantize=False, log=None):
+	return await default_service().encode(inputs, out, password, section_size, quantize, log)
+
+async def decode(src, out_dir=None, password=None, log=None):
+	return await default_service().decode(src, out_dir, password, log)
+
+# =====================================================================================================================
+
+# These run in threads (the _read/_write ones) or in the pool (_logged)
+
+def _logged(function, *args):
+	messages = []
+	return function(*args, log=messages.append), messages
+
+def _read_inputs(inputs):
+	# Inputs as (name, bytes) or (name, bytes, section size), the same names fef.encode would give them
+	items = []
+	for item in inputs:
+		if isinstance(item, (str, os.PathLike)):
+			items.append((os.fsdecode(item), _read_source(item)))
+		else:
+			items.append((item[0], _read_source(item[1])) + tuple(item[2:]))
+	return items
+
+def _read_source(src):
+	if isinstance(src, (bytes, bytearray, memoryview)):
+		return bytes(src)
+	if isinstance(src, (str, os.PathLike)):
+		try:
+			with open(src, "rb") as f:
+				return f.read()
+		except OSError:
+			raise FEFError("Cannot open file " + os.fsdecode(src) + "!")
+	return src.read()
+
+def _write_output(out, data):
+	if isinstance(out, (str, os.PathLike)):
+		with open(out, "wb") as f:
+			f.write(data)
+	else:
+		out.write(data)
+
+def _write_files(out_dir, files, failed):
+	# Same as fef.decode, a file that can't be written doesn't stop the others and DecodeFailed names it (and the ones
+	# in failed, which couldn't be decoded) afterwards
+	outputs = decoder.Outputs(out_dir)
+	failed = list(failed)
+	for name, data in files.items():
+		try:
+			file = outputs.open(name, len(data))
+			try:
+				file.write(data)
+			finally:
+				outputs.close(name, file)
+		except OSError:
+			failed.append(name)
+	if len(failed) > 0:
+		error = DecodeFailed("Could not decode " + ", ".join(failed) + "!")
+		error.files = {name: path for name, path in outputs.files.items() if not name in failed}
+		error.failed = failed
+		raise error
+	return outputs.files
+
+def _quiet(message):
+	pass
@@ -0,0 +1,281 @@
+# Pieces of the FEF container format shared by the encoder and the decoder
+#
+# Layout (version 11):
+#   "FEF", version byte, encryption flag byte (0 or 1),
+#   only when encrypted: 8 byte nonce, 16 byte salt, number of key derivation iterations (big-endian u32)
+#   for every file: "F", "N" + UTF-8 name + null, "L" + number of sections (big-endian u32),
+#                   "Z" + number of bytes per section (big-endian u32, the last section may be shorter),
+#                   "C" + coding byte (see below), "S",
+#                   then for every section: "l" + number of bytes in it (big-endian u32),
+#                                           "p" + precision byte (only when it isn't 0, see below),
+#                                           "c" + CRC32 of its bytes (big-endian u32), "s" + values
+#   "E"
+#   index: "I" + number of files (big-endian u32), then for every file: UTF-8 name + null, original length
+#          (big-endian u64), number of sections (big-endian u32), offset of its "F" in the body (big-endian u64)
+#   offset of the index in the body (big-endian u64)
+# The body is everything after the header, offsets count from its first byte. Version 10 is the same without the salt
+# and iterations (the key is the repeated password), version 9 is also without "c",
+# version 8 is also without "p", version 7 is also without "C", version 6 is also without "Z" and version 5 is also
+# without the index.
+# Everything after the header is encrypted when the flag is set. Version 5 uses Serpent in counter mode, so every
+# 16 byte block can be encrypted or decrypted on its own. Since version 11 its key is derived from the password with
+# PBKDF2. Versions 2 to 4 have no nonce and use the old sequential scheme, which is still read.
+
+import collections
+import struct
+
+from . import serpent
+from .lazy import lazy_import
+
+np = lazy_import("numpy") # only imported once something is encrypted or decrypted
+hashlib = lazy_import("hashlib") # only imported once a key is derived
+
+MAGIC = b"FEF"
+VERSION = 11 # version written by the encoder
+MIN_VERSION = 2 # oldest version the decoder can read
+CTR_VERSION = 5 # first version that encrypts in counter mode
+INDEX_VERSION = 6 # first version with an index of the files at the end
+SIZE_VERSION = 7 # first version with the section size of every file
+HALF_VERSION = 8 # first version with a coding for every file
+PRECISION_VERSION = 9 # first version with precision tags on sections
+CHECKSUM_VERSION = 10 # first version with a checksum for every section
+KDF_VERSION = 11 # first version that derives the key from the password with a salt
+NONCE_SIZE = 8 # bytes of random nonce in the header of encrypted containers (the other 8 bytes are the block counter)
+SALT_SIZE = 16 # bytes of random salt in the header of encrypted containers
+KDF_ITERATIONS = 600000 # PBKDF2 iterations written by the encoder (stored in the header, so it can be raised later)
+MAX_KDF_ITERATIONS = 10 * KDF_ITERATIONS # most PBKDF2 iterations the decoder accepts from a header
+PARALLEL_MIN = 1 << 16 # smallest amount of data worth splitting over a process pool
+FOOTER_SIZE = 8 # bytes at the end of the body that hold the offset of the index
+INT16_LENGTH = 64 # longest section quantized coefficients are stored as 16 bit integers for
+
+# =====================================================================================================================
+
+class FEFError(Exception):
+	# Raised for anything that stops files from being encoded or decoded
+	pass
+
+class PasswordRequired(FEFError):
+	# Raised when decoding an encrypted file without a password
+	pass
+
+class DecodeFailed(FEFError):
+	# Raised by decode after the files that could be decoded are done when some couldn't be. Its files are what decode
+	# would have returned for the others and failed the names of the ones that failed.
+	pass
+
+# =====================================================================================================================
+
+def body_start(version, encrypted):
+	# Offset of the first byte after the header
+	return 5 + (NONCE_SIZE if encrypted and version >= CTR_VERSION else 0) + (SALT_SIZE + 4 if encrypted and version >= KDF_VERSION else 0)
+
+# =====================================================================================================================
+
+# Codings (how the coefficients of a section are stored)
+# Sections are made of bytes, which are real, so the second half of their spectrum mirrors the first and only
+# length // 2 + 1 coefficients are needed. The imaginary parts of the first (and for an even length the middle) one are
+# always 0, which leaves exactly one value per byte: the real part of the first coefficient, then real/imaginary pairs
+# (without the last imaginary part for an even length).
+
+CODING_FULL = 0 # every complex number as a real/imaginary float pair, float16 (float64 before version 4)
+CODING_HALF = 1 # half spectrum as float16 values (default since version 8)
+CODING_INT = 2 # half spectrum as integers (the values times int_scale), exact by construction
+
+# float16 doesn't always give back every byte, so the encoder checks every section and stores the ones that wouldn't
+# come back at a higher precision, tagged with its number (only for CODING_HALF)
+PRECISIONS = (">f2", ">f4", ">f8")
+
+def section_format(version, coding, length, precision=0):
+	# numpy dtype and number of the values that store a section of length bytes
+	if coding == CODING_FULL:
+		return (">f2" if version >= 4 else ">f8"), length * 2
+	if coding == CODING_INT:
+		return (">i2" if length <= INT16_LENGTH else ">i4"), length
+	return PRECISIONS[precision if precision < len(PRECISIONS) else 0], length
+
+def int_scale(length):
+	# Quantized values are rounded to a multiple of 1 / int_scale, so each is off by at most half of that. A byte adds up
+	# at most 2 * length of them, so it is off by at most length / int_scale, which is kept at 0.25 or less and always
+	# rounds back to the right byte. Values are at most 128, which still fits in the integers.
+	return 1 << 8 if length <= INT16_LENGTH else 1 << 23
+
+# =====================================================================================================================
+
+# Counter mode encryption (version 5)
+# Block i of the body is XORed with the encryption of nonce + i (as a little-endian u64) under a 32 byte key made
+# from the password, so the same function encrypts and decrypts and any block can be done on its own.
+
+def ctr_key(password):
+	# 32 bytes (256 bits) of repeated password (versions 5 to 10)
+	b = password.encode("utf-8")
+	return (b * (32 // len(b) + 1))[:32]
+
+def derive_key(password, salt, iterations):
+	# 32 byte key from PBKDF2-HMAC-SHA256 (version 11)
+	return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, 32)
+
+def kdf_header(salt, iterations=KDF_ITERATIONS):
+	# Salt and iterations as they are written after the nonce
+	return salt + struct.pack(">I", iterations)
+
+def header_key(version, header, password):
+	# Counter mode key of a container from its header (everything up to body_start)
+	if version < KDF_VERSION:
+		return ctr_key(password)
+	salt = bytes(header[5 + NONCE_SIZE : 5 + NONCE_SIZE + SALT_SIZE])
+	iterations = struct.unpack(">I", header[5 + NONCE_SIZE + SALT_SIZE : 5 + NONCE_SIZE + SALT_SIZE + 4])[0]
+	# Anything above MAX_KDF_ITERATIONS would let a crafted header keep the decoder busy for as long as it likes
+	if iterations == 0 or iterations > MAX_KDF_ITERATIONS:
+		raise FEFError("Invalid key derivation in header!")
+	return derive_key(password, salt, iterations)
+
+def ctr_crypt(data, key, nonce, offset):
+	# Encrypts or decrypts data that starts offset bytes into the body (key is a 32 byte key or a serpent.SerpentKey)
+	first, skip = divmod(offset, 16)
+	count = -(-(skip + len(data)) // 16)
+	
+	# Every counter block at once, encrypted in batches
+	counters = np.empty((count, 2), dtype="<u8")
+	counters[:, 0] = struct.unpack("<Q", nonce)[0]
+	counters[:, 1] = np.arange(first, first + count, dtype=np.uint64)
+	stream = np.frombuffer(serpent.encrypt_blocks(counters, key), dtype=np.uint8)
+	
+	result = np.frombuffer(data, dtype=np.uint8) ^ stream[skip : skip+len(data)]
+	return result.tobytes()
+
+class CTRCipher:
+	# Counter mode key and nonce of one container, optionally spreading big pieces of data over a process pool
+	def __init__(self, key, nonce, pool=None, jobs=1):
+		# Expanded here rather than through serpent.expand_key, whose cache would keep the key around after the container
+		self.key = serpent.SerpentKey(key)
+		self.nonce = nonce
+		self.pool = pool
+		self.jobs = jobs
+	
+	def crypt(self, data, offset):
+		if self.pool is None or len(data) < PARALLEL_MIN:
+			return ctr_crypt(data, self.key, self.nonce, offset)
+		
+		# Every job gets an equal piece of whole blocks
+		piece = -(-len(data) // self.jobs // 16) * 16
+		futures = []
+		for i in range(0, len(data), piece):
+			futures.append(self.pool.submit(ctr_crypt, bytes(data[i : i+piece]), self.key, self.nonce, offset + i))
+		return b"".join(future.result() for future in futures)
+
+class CTRReader:
+	# Decrypts a stream in counter mode as it is read, a big piece at a time so a pool has something to work on
+	def __init__(self, stream, cipher, read_ahead=1 << 20):
+		self.stream = stream
+		self.cipher = cipher
+		self.read_ahead = read_ahead
+		self.decoded = bytearray()
+		self.offset = 0 # position in the body of the next byte read from the stream
+	
+	def read(self, n):
+		while len(self.decoded) < n:
+			data = self.stream.read(max(n, self.read_ahead))
+			if not data:
+				break
+			self.decoded += self.cipher.crypt(data, self.offset)
+			self.offset += len(data)
+		
+		result = bytes(self.decoded[:n])
+		del self.decoded[:n]
+		return result
+
+# =====================================================================================================================
+
+# Sequential encryption (versions 2 to 4)
+# Data is encrypted 16 bytes (128 bits) at a time with 32 bytes (256 bits) of repeated key at a time. The key offset
+# moves along the password for every block; a partial block at the end is padded with null bytes.
+
+def crypt_blocks(function, data, password, key_o):
+	# Runs serpent.encrypt_block or serpent.decrypt_block over data, returns the result and the key offset to go on from
+	out_bytes = bytearray()
+	for i in range(0, len(data), 16):
+		# Figure out key (the key schedule for each distinct key is only expanded once, see serpent.expand_key)
+		key_o = (key_o + (32 % len(password))) % len(password)
+		key = serpent.expand_key(key_o)
+		
+		# Encryption woo
+		out_bytes += function(data[i : i+16], key)
+	return out_bytes, key_o
+
+class DecryptReader:
+	# Decrypts a sequentially encrypted stream as it is read
+	def __init__(self, stream, password):
+		self.stream = stream
+		self.password = password
+		self.pending = bytearray() # encrypted bytes that don't fill a block yet
+		self.decoded = bytearray()
+		self.key_o = 0 # key offset
+	
+	def read(self, n):
+		while len(self.decoded) < n:
+			data = self.stream.read(max(n, 1 << 16))
+			if not data:
+				# A partial block at the very end gets padded, the same as when decrypting everything at once
+				decoded, self.key_o = crypt_blocks(serpent.decrypt_block, self.pending, self.password, self.key_o)
+				self.decoded += decoded
+				self.pending = bytearray()
+				break
+			self.pending += data
+			whole = len(self.pending) - len(self.pending) % 16
+			decoded, self.key_o = crypt_blocks(serpent.decrypt_block, self.pending[:whole], self.password, self.key_o)
+			self.decoded += decoded
+			del self.pending[:whole]
+		
+		result = bytes(self.decoded[:n])
+		del self.decoded[:n]
+		return result
+
+# =====================================================================================================================
+
+# Index (version 6)
+# Every file gets an entry with its name, original length, number of sections and the offset of its "F" in the body,
+# so files can be listed or extracted without going through everything before them. offset is None for files found by
+# parsing a container without an index.
+
+IndexEntry = collections.namedtuple("IndexEntry", ["name", "length", "sections", "offset"])
+
+def index_bytes(entries):
+	# Index as it is written after the end marker (without the footer)
+	out = bytearray(b"I" + struct.pack(">I", len(entries)))
+	for entry in entries:
+		out += entry.name.encode("utf-8") + b"\x00"
+		out += struct.pack(">QIQ", entry.length, entry.sections, entry.offset)
+	return bytes(out)
+
+def parse_index(data):
+	# Reads the index written by index_bytes
+	if len(data) < 5 or not data[0:1] == b"I":
+		raise FEFError("Invalid index! The file may be corrupt or the password may be wrong.")
+	count = struct.unpack(">I", data[1:5])[0]
+	entries = []
+	pos = 5
+	for i in range(count):
+		null = data.find(b"\x00", pos)
+		if null == -1 or null + 21 > len(data):
+			raise FEFError("Invalid index! The file may be corrupt or the password may be wrong.")
+		name = decode_name(data[pos:null])
+		length, sections, offset = struct.unpack(">QIQ", data[null+1 : null+21])
+		entries.append(IndexEntry(name, length, sections, offset))
+		pos = null + 21
+	return entries
+
+# =====================================================================================================================
+
+def next_generic_name(names):
+	# Name for a file that doesn't have one
+	i = 1
+	while "output" + str(i) + ".txt" in names:
+		i += 1
+	return "output" + str(i) + ".txt"
+
+def decode_name(name):
+	# File names are UTF-8, anything else means the container is broken (or the password is wrong)
+	try:
+		return bytes(name).decode(encoding="UTF-8")
+	except UnicodeDecodeError:
+		raise FEFError("Invalid file name! The file may be corrupt or the password may be wrong.")
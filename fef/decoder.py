@@ -0,0 +1,830 @@
+# Turns a FEF container back into files
+
+import array
+import collections
+import io
+import itertools
+import mmap
+import os
+import stat
+import struct
+import zlib
+
+from .container import MAGIC, NONCE_SIZE, VERSION, MIN_VERSION, CTR_VERSION, CTRCipher, CTRReader, DecryptReader, FEFError, PasswordRequired
+from .container import CODING_FULL, CODING_HALF, CODING_INT, FOOTER_SIZE, HALF_VERSION, INDEX_VERSION, PRECISION_VERSION
+from .container import CHECKSUM_VERSION, SIZE_VERSION, DecodeFailed, IndexEntry
+from .container import body_start, crypt_blocks, decode_name, header_key, int_scale, next_generic_name, parse_index, section_format
+from . import serpent
+from .lazy import lazy_import
+
+np = lazy_import("numpy") # only imported once something is decoded
+futures = lazy_import("concurrent.futures") # only imported with more than one job
+
+CHUNK_SIZE = 1 << 20 # how many bytes are buffered at most before they are written in stream mode (and checked at a time)
+RUN_BLOCK = 1 << 10 # how many section records parse_sections compares at a time at most
+
+# Markers of the container body as the integers a byte of it is read as (see fef/container.py for the layout)
+MARK_END = ord("E")
+MARK_FILE = ord("F")
+MARK_NAME = ord("N")
+MARK_LENGTH = ord("L")
+MARK_SIZE = ord("Z")
+MARK_CODING = ord("C")
+MARK_SECTION_LENGTH = ord("l")
+MARK_PRECISION = ord("p")
+MARK_CHECKSUM = ord("c")
+MARK_SECTION = ord("s")
+
+# Something wrong with a container that verify found: the file it belongs to (None for the container as a whole), for
+# a section that doesn't match its checksum its number in that file, where it starts in the file and where its values
+# start in the (decrypted) container (all None for problems with the structure), and what is wrong
+BadSection = collections.namedtuple("BadSection", ["name", "section", "offset", "position", "problem"])
+
+# =====================================================================================================================
+
+# Decodes a FEF container
+#   src: path, bytes or readable binary file object
+#   out_dir: folder to write the files to (created if needed), if None the files are returned as bytes
+#   password: password the container was encrypted with (PasswordRequired if it is encrypted and this is None or "")
+#   stream: decode one section at a time instead of reading the whole container first (needed for stdin and other
+#           pipes to keep memory use down)
+#   jobs: number of processes decrypting at the same time (0 uses every CPU, only counter mode can be split up), and of
+#         threads decoding and writing files at the same time (not when streaming)
+#   log: called with progress and warning messages (e.g. print)
+# Returns a dict of file name -> output path (or bytes if out_dir is None), in the order they were stored
+# If some files can't be decoded or written, the rest still are and DecodeFailed afterwards has those in its files and
+# the names of the ones that failed in its failed (with out_dir=None the bytes that did come out aren't lost).
+def decode(src, out_dir=None, password=None, stream=False, jobs=1, log=None):
+	log = log or _quiet
+	f, close = _open_source(src)
+	cipher = None
+	try:
+		version, encrypted, start, header, cipher = _read_header(f, password, jobs, log)
+		
+		outputs = Outputs(out_dir)
+		if stream:
+			if cipher:
+				reader = CTRReader(f, cipher)
+			else:
+				reader = DecryptReader(f, password) if encrypted else f
+			_decode_stream(reader, version, outputs, log)
+			return outputs.files
+		
+		data = _read_all(src, f, encrypted, start, header, password, cipher, log)
+		log("Extracting data")
+		raw_files = parse_sections(data, version, start, log)
+		
+		# Convert to files
+		log("Writing files")
+		_write_files(raw_files, outputs, jobs or os.cpu_count(), log)
+		return outputs.files
+	finally:
+		if cipher and cipher.pool:
+			cipher.pool.shutdown()
+		if close:
+			f.close()
+
+# Lists the files in a FEF container (src and password are the same as for decode)
+# Returns a list of IndexEntry (name, original length, number of sections, offset of the file in the body)
+# Containers since version 6 have an index, so only that is read; older ones have to be parsed completely.
+def list_files(src, password=None, log=None):
+	log = log or _quiet
+	f, close = _open_source(src)
+	try:
+		version, encrypted, start, header, cipher = _read_header(f, password, 1, log)
+		if version >= INDEX_VERSION:
+			body = _Body(f, start, cipher)
+			return body.index()
+		return _parse_index(f, version, encrypted, start, header, password, cipher, log)
+	finally:
+		if close:
+			f.close()
+
+# Decodes only the files called name (a name or a list of names) from a FEF container, see decode for the rest
+# With an index (version 6 and up) the container is read only where those files are.
+def extract(src, name, out_dir=None, password=None, log=None):
+	log = log or _quiet
+	names = [name] if isinstance(name, str) else list(name)
+	f, close = _open_source(src)
+	try:
+		version, encrypted, start, header, cipher = _read_header(f, password, 1, log)
+		outputs = Outputs(out_dir)
+		if version < INDEX_VERSION:
+			# No index, everything has to be decoded
+			f.seek(0)
+			files = decode(f, None, password, log=log)
+			for n in names:
+				if not n in files:
+					raise FEFError("File " + n + " is not in the container!")
+				file = outputs.open(n)
+				file.write(files[n])
+				outputs.close(n, file)
+			return outputs.files
+		
+		body = _Body(f, start, cipher)
+		entries = body.index()
+		for n in names:
+			if not any(entry.name == n for entry in entries):
+				raise FEFError("File " + n + " is not in the container!")
+		
+		# A file goes from its offset to the next file's offset (or the end marker for the last one)
+		ends = [entry.offset for entry in entries[1:]] + [body.index_offset]
+		for entry, end in zip(entries, ends):
+			if not entry.name in names:
+				continue
+			raw_files = parse_sections(body.read(entry.offset, end - entry.offset), version, 0, log)
+			for raw_name, raw in raw_files.items():
+				file = outputs.open(raw_name, int(raw.lengths().sum()))
+				_warn_bad(raw_name, write_sections(file, raw.groups(), raw.coding, raw.checksums), log)
+				outputs.close(raw_name, file)
+		return outputs.files
+	finally:
+		if close:
+			f.close()
+
+# Checks every section of a FEF container against its checksum without writing anything (src and password are the same
+# as for decode)
+#   jobs: number of processes decoding sections at the same time (0 uses every CPU)
+# Returns a list of BadSection, empty if everything is fine: files without as many sections as they should have, a
+# missing end marker, an index (since version 6) that doesn't match the files, then every section that doesn't match
+# its checksum and every batch of sections that couldn't be decoded at all. Containers before version 10 have no checksums, so only their structure gets checked.
+def verify(src, password=None, jobs=1, log=None):
+	log = log or _quiet
+	f, close = _open_source(src)
+	cipher = None
+	pool = None
+	try:
+		version, encrypted, start, header, cipher = _read_header(f, password, jobs, log)
+		if version < CHECKSUM_VERSION:
+			log("INFO: version " + str(version) + " has no checksums, only the structure of the file is checked")
+		data = _read_all(src, f, encrypted, start, header, password, cipher, log)
+		bad = []
+		raw_files = parse_sections(data, version, start, log, bad)
+		if version >= INDEX_VERSION:
+			bad += _check_index(data, start, raw_files, log)
+		if version < CHECKSUM_VERSION:
+			return bad
+		
+		# Sections are checked CHUNK_SIZE bytes at a time, in a process pool if there is more than one job
+		batches = [] # (file name, first section, last section)
+		for name, raw in raw_files.items():
+			first = 0
+			while first < len(raw):
+				last, size = first, 0
+				while last < len(raw) and size < CHUNK_SIZE:
+					size += raw.counts[last]
+					last += 1
+				batches.append((name, first, last))
+				first = last
+		
+		log("Checking sections")
+		args = ((list(raw_files[name].groups(first, last)), raw_files[name].coding, raw_files[name].checksums[first:last]) for name, first, last in batches)
+		if jobs == 1:
+			results = map(_check_sections, args)
+		else:
+			pool = cipher.pool if cipher and cipher.pool else futures.ProcessPoolExecutor(jobs or os.cpu_count())
+			results = pool.map(_check_sections, args)
+		
+		offsets = dict() # file name -> where every section starts in the file
+		for (name, first, last), (numbers, error) in zip(batches, results):
+			raw = raw_files[name]
+			if not error is None:
+				bad.append(BadSection(name, None, None, None, "undecodable: " + error))
+				log("WARNING: sections " + str(first) + " to " + str(last - 1) + " of " + name + " could not be decoded (" + error + ")")
+			for number in numbers:
+				if not name in offsets:
+					offsets[name] = [0] + list(itertools.accumulate(raw.lengths().tolist()))
+				i = first + number
+				bad.append(BadSection(name, i, offsets[name][i], raw.positions[i], "checksum"))
+				log("WARNING: section " + str(i) + " of " + name + " (at byte " + str(offsets[name][i]) + ") does not match its checksum")
+		return bad
+	finally:
+		if not pool is None:
+			pool.shutdown()
+		if cipher and cipher.pool and not cipher.pool is pool:
+			cipher.pool.shutdown()
+		if close:
+			f.close()
+
+def check_header(header, log=None):
+	# Validates the 5 header bytes, returns the version and whether the container is encrypted
+	log = log or _quiet
+	
+	# Validate file is FEF
+	if not bytes(header[0:3]) == MAGIC or len(header) < 5:
+		raise FEFError("Invalid FEF file!")
+	
+	# Parse version number
+	version = header[3] # int
+	if version < MIN_VERSION or version > VERSION:
+		raise FEFError("Unsupported file version!")
+	
+	# Old version number message
+	if version < 4:
+		log("INFO: Old FEF version! Re-encode the file to enjoy the benefits of smaller file size.")
+	
+	return version, header[4] == 1
+
+# =====================================================================================================================
+
+class RawFile:
+	# Sections of a file as they are found in a container
+	# Only a few bytes are kept for every section (where its values are, how many there are and of which type), the
+	# values themselves stay in the container until groups() hands them out
+	def __init__(self, data, coding):
+		self.data = data # the whole container
+		self.coding = coding
+		self.positions = array.array("Q") # where the values of every section start in the container
+		self.counts = array.array("L") # number of values of every section
+		self.formats = array.array("B") # dtype of every section (an index into dtypes)
+		self.dtypes = list()
+		self.checksums = array.array("q") # CRC32 of the bytes of every section (-1 if it doesn't have one)
+	
+	def __len__(self):
+		return len(self.positions)
+	
+	def append(self, position, count, dtype, checksum):
+		if not dtype in self.dtypes:
+			self.dtypes.append(dtype)
+		self.positions.append(position)
+		self.counts.append(count)
+		self.formats.append(self.dtypes.index(dtype))
+		self.checksums.append(-1 if checksum is None else checksum)
+	
+	def extend(self, positions, count, dtype, checksums):
+		# Same as append for several sections with the same number and type of values (checksums is None or an array)
+		if not dtype in self.dtypes:
+			self.dtypes.append(dtype)
+		self.positions.extend(positions)
+		self.counts.extend(itertools.repeat(count, len(positions)))
+		self.formats.extend(itertools.repeat(self.dtypes.index(dtype), len(positions)))
+		self.checksums.extend(itertools.repeat(-1, len(positions)) if checksums is None else checksums.tolist())
+	
+	def lengths(self):
+		# Number of bytes every section turns into
+		counts = np.array(self.counts, dtype=np.int64)
+		return counts // 2 if self.coding == CODING_FULL else counts
+	
+	def groups(self, first=0, last=None):
+		# 2D arrays of the stored values of sections first to last (one per row) for write_sections, one for every run of
+		# sections with the same number and type of values that are evenly spaced in the container (normally every section
+		# but the last). They are strided views of the container, so nothing is copied until the values are transformed,
+		# and each covers about CHUNK_SIZE bytes so the transform never needs much more memory than that.
+		last = len(self) if last is None else last
+		i = first
+		while i < last:
+			count = self.counts[i]
+			dtype = np.dtype(self.dtypes[self.formats[i]])
+			rows = max(CHUNK_SIZE // max(count, 1), 1)
+			stride = 0
+			j = i + 1
+			while j < last and j - i < rows and self.counts[j] == count and self.formats[j] == self.formats[i]:
+				if j == i + 1:
+					stride = self.positions[j] - self.positions[i]
+				elif not self.positions[j] - self.positions[j-1] == stride:
+					break
+				j += 1
+			yield np.ndarray((j - i, count), dtype=dtype, buffer=self.data, offset=self.positions[i], strides=(stride, dtype.itemsize))
+			i = j
+
+def parse_sections(input_binary, version, start, log=None, problems=None):
+	# Parses a whole (decrypted) container with its body at start into a dict of file name -> RawFile
+	# If problems is a list, a BadSection is added to it for every file with a different number of sections than its "L"
+	# says and for a missing end marker (without one, parts of a container can be parsed as well)
+	# Only the markers are walked one by one, section values are left where they are (see RawFile), and the records of
+	# sections that look exactly like the one before them (every section of a file but the last normally) are taken a
+	# whole run at a time
+	log = log or _quiet
+	data = memoryview(input_binary)
+	raw_files = dict()
+	pos = start # skip header
+	end_len = 0 # number of sections the current file should have
+	bin_len = 0 # number of bytes in the next section
+	section_size = 0 # number of bytes in a section of the current file (0 if not known)
+	coding = default_coding(version)
+	precision = 0 # precision of the next section
+	checksum = None # checksum of the next section
+	record = 0 # where the record of the next section starts (its "l" marker)
+	file_name = ""
+	
+	def read_length(pos):
+		# Big-endian 32-bit length right after a marker (missing bytes count as 0, the same as running out of file)
+		return int.from_bytes(bytes(data[pos:pos+4]).ljust(4, b"\x00"), byteorder="big")
+	
+	def check_length():
+		# The file that was parsed last has to have as many sections as its "L" says
+		if not file_name == "" and not len(raw_files[file_name]) == end_len:
+			log("WARNING: file lengths do not match. Created file may be corrupt or dangerous. (" + file_name + ")")
+			if not problems is None:
+				problems.append(BadSection(file_name, None, None, None, str(len(raw_files[file_name])) + " of " + str(end_len) + " sections"))
+	
+	def repeats(record, head, checksum_at):
+		# Number of records right after the one from record to pos that have the same head (markers, length and
+		# precision, head bytes from record) apart from the checksum at checksum_at (0 for none), in strided views of up to
+		# RUN_BLOCK heads at a time. Such a record is parsed exactly like the one before it, so its values are as many and
+		# of the same type and the one after it is just as far away again.
+		size = pos - record
+		rows = (len(data) - pos) // size
+		same = np.ones(head, dtype=bool)
+		if checksum_at:
+			same[checksum_at:checksum_at+4] = False
+		first = np.frombuffer(data, np.uint8, head, record)[same]
+		n = 0
+		block = 16
+		while n < rows:
+			block = min(block * 2, RUN_BLOCK, rows - n)
+			heads = np.ndarray((block, head), dtype=np.uint8, buffer=data, offset=pos + n * size, strides=(size, 1))
+			matches = (heads[:, same] == first).all(axis=1)
+			if not matches.all():
+				return n + int(matches.argmin())
+			n += block
+		return n
+	
+	while pos < len(data):
+		byte = data[pos]
+		pos += 1
+		
+		# End of file (useful with password because extra bytes may be added), check section length to verify integrity
+		if byte == MARK_END:
+			check_length()
+			break
+		
+		# Start of file (used to reset variables)
+		elif byte == MARK_FILE:
+			check_length()
+			file_name = ""
+			end_len = 0
+			bin_len = 0
+			section_size = 0
+			coding = default_coding(version)
+		
+		# File name (null-terminated)
+		elif byte == MARK_NAME:
+			null = input_binary.find(b"\x00", pos)
+			if null == -1:
+				null = len(data)
+			
+			# Check if string is invalid
+			if null == pos:
+				file_name = next_generic_name(raw_files)
+				log("WARNING: a file does not have a name. Defaulting to " + file_name)
+			else:
+				file_name = decode_name(data[pos:null])
+			raw_files[file_name] = RawFile(data, coding)
+			pos = null + 1
+		
+		# Array length (number of sections)
+		elif byte == MARK_LENGTH:
+			end_len = read_length(pos)
+			pos += 4
+		
+		# Section size (since version 7)
+		elif byte == MARK_SIZE and version >= SIZE_VERSION:
+			section_size = read_length(pos)
+			pos += 4
+		
+		# Coding of the sections (since version 8), only before the first section of a file (it is the coding of all of them)
+		elif byte == MARK_CODING and version >= HALF_VERSION:
+			if file_name == "" or len(raw_files[file_name]) == 0:
+				coding = data[pos] if pos < len(data) else 0
+				if not file_name == "":
+					raw_files[file_name].coding = coding
+			pos += 1
+		
+		# Subarray length (number of bytes in section)
+		elif byte == MARK_SECTION_LENGTH:
+			record = pos - 1
+			bin_len = read_length(pos)
+			pos += 4
+			if section_size and bin_len > section_size:
+				log("WARNING: a section is bigger than the section size of its file. Created file may be corrupt. (" + file_name + ")")
+		
+		# Precision of the next section (since version 9)
+		elif byte == MARK_PRECISION and version >= PRECISION_VERSION:
+			precision = data[pos] if pos < len(data) else 0
+			pos += 1
+		
+		# Checksum of the next section (since version 10)
+		elif byte == MARK_CHECKSUM and version >= CHECKSUM_VERSION:
+			checksum = read_length(pos)
+			pos += 4
+		
+		# Start of section binary (values of the coding)
+		elif byte == MARK_SECTION:
+			# Check for file name
+			if file_name == "":
+				file_name = next_generic_name(raw_files)
+				log("WARNING: a file does not have a name. Defaulting to " + file_name)
+				raw_files[file_name] = RawFile(data, coding)
+			
+			# A truncated file only gets the values that are actually there (whole complex numbers for CODING_FULL)
+			dtype, full = section_format(version, coding, bin_len, precision)
+			size = np.dtype(dtype).itemsize
+			count = min(full, (len(data) - pos) // size)
+			if coding == CODING_FULL:
+				count -= count % 2
+			raw_files[file_name].append(pos, count, dtype, checksum)
+			values = pos
+			pos += count * size
+			if count < full:
+				pos = len(data) # whatever is left of a truncated section can't be parsed as anything
+			
+			# Nothing but "l", "p" and "c" between record and the values, then a run of records just like it can follow
+			head = 6 + (2 if precision else 0) + (0 if checksum is None else 5)
+			if values - record == head and data[record] == MARK_SECTION_LENGTH and not (section_size and bin_len > section_size) \
+					and (not precision or data[record+5] == MARK_PRECISION) and (checksum is None or data[values-6] == MARK_CHECKSUM):
+				run = repeats(record, head, 0 if checksum is None else head - 5)
+				if run > 0:
+					step = pos - record
+					checksums = None if checksum is None else np.ndarray((run,), dtype=">u4", buffer=data, offset=pos + head - 5, strides=(step,))
+					raw_files[file_name].extend(range(values + step, values + step * (run + 1), step), count, dtype, checksums)
+					pos += run * step
+			precision = 0
+			checksum = None
+		
+		# Anything else is just skipped
+	
+	else:
+		# Ran out of data before the end marker
+		check_length()
+		if not problems is None:
+			log("WARNING: the container has no end marker. It may be truncated or the password may be wrong.")
+			problems.append(BadSection(None, None, None, None, "no end marker"))
+	
+	return raw_files
+
+def write_sections(file, groups, coding=CODING_FULL, checksums=None):
+	# Every group is a 2D array of the stored values of sections with the same number of values (one per row), which go
+	# through one fft together (see RawFile.groups and stack_sections)
+	# Returns the numbers of the sections that don't match their checksums (-1 is no checksum, nothing is written if file
+	# is None)
+	bad = []
+	first = 0
+	for group in groups:
+		length = group.shape[1]
+		if length == 0:
+			decoded = np.empty((len(group), 0), dtype=np.int8)
+		else:
+			decoded = section_bytes(group, length, coding)
+		if not file is None:
+			# The array is written as it is (without a copy to bytes first)
+			file.write(decoded)
+		if checksums:
+			for i, (section, checksum) in enumerate(zip(decoded, checksums[first : first+len(group)])):
+				if checksum >= 0 and not zlib.crc32(section) == checksum:
+					bad.append(first + i)
+		first += len(group)
+	return bad
+
+def stack_sections(sections):
+	# Groups for write_sections from a list of sections: neighbours with the same number of values get stacked (sections
+	# at a higher precision are stacked with the rest, which just widens the float16 ones without changing them)
+	return [np.stack(list(group)) for length, group in itertools.groupby(sections, key=len)]
+
+def section_bytes(values, length, coding):
+	# Turns the stored values of sections (one per row) back into their bytes, the encoder checks sections with this too
+	values = values.astype(np.float64)
+	if coding == CODING_FULL:
+		samples = np.fft.fft(values.view(np.complex128), axis=1).real
+	else:
+		if coding == CODING_INT:
+			values /= int_scale(length)
+		samples = np.fft.irfft(half_spectrum(values), n=length, axis=1, norm="forward")
+	return np.rint(samples).astype(np.int8)
+
+def half_spectrum(values):
+	# Puts the zero imaginary parts back into the values of half spectrum sections (see container.py)
+	length = values.shape[1]
+	spectrum = np.zeros((values.shape[0], (length // 2 + 1) * 2))
+	spectrum[:, 0] = values[:, 0]
+	spectrum[:, 2 : length+1] = values[:, 1:]
+	return spectrum.view(np.complex128)
+
+def default_coding(version):
+	# Coding of files that don't say
+	return CODING_FULL if version < HALF_VERSION else CODING_HALF
+
+def _decode_stream(reader, version, outputs, log):
+	# Every file is written while it is being read, so memory use doesn't depend on the input size
+	file = None # file currently being written
+	file_name = ""
+	sections = list() # sections waiting to be written
+	checksums = list() # their checksums
+	end_len = 0 # number of sections the current file should have
+	bin_len = 0 # number of bytes in the next section
+	section_size = 0 # number of bytes in a section of the current file (0 if not known)
+	coding = default_coding(version)
+	precision = 0 # precision of the next section
+	checksum = None # checksum of the next section
+	count = 0 # number of sections read for the current file
+	buffered = 0 # number of bytes waiting to be written
+	
+	def write_buffered():
+		first = count - len(sections)
+		_warn_bad(file_name, [first + i for i in write_sections(file, stack_sections(sections), coding, checksums)], log)
+		sections.clear()
+		checksums.clear()
+	
+	def finish_file():
+		# Write what is left of the current file and check its section length to verify integrity
+		write_buffered()
+		outputs.close(file_name, file)
+		if not count == end_len:
+			log("WARNING: file lengths do not match. Created file may be corrupt or dangerous. (" + file_name + ")")
+	
+	log("Extracting data")
+	while (byte := reader.read(1)):
+		# End of file (useful with password because extra bytes may be added)
+		if byte == b"E":
+			break
+		
+		# Start of file
+		elif byte == b"F":
+			if not file is None:
+				finish_file()
+			file = None
+			end_len = 0
+			section_size = 0
+			coding = default_coding(version)
+			count = 0
+			buffered = 0
+		
+		# File name (null-terminated)
+		elif byte == b"N":
+			temp = bytearray()
+			while (byte := reader.read(1)) and not byte == b"\x00":
+				temp += byte
+			
+			# Check if string is invalid
+			if len(temp) == 0:
+				file_name = next_generic_name(outputs.files)
+				log("WARNING: a file does not have a name. Defaulting to " + file_name)
+			else:
+				file_name = decode_name(temp)
+			file = outputs.open(file_name)
+		
+		# Array length (number of sections)
+		elif byte == b"L":
+			end_len = int.from_bytes(reader.read(4), byteorder="big")
+		
+		# Section size (since version 7)
+		elif byte == b"Z" and version >= SIZE_VERSION:
+			section_size = int.from_bytes(reader.read(4), byteorder="big")
+		
+		# Coding of the sections (since version 8)
+		elif byte == b"C" and version >= HALF_VERSION:
+			value = int.from_bytes(reader.read(1), byteorder="big")
+			if count == 0:
+				coding = value
+		
+		# Subarray length (number of bytes in section)
+		elif byte == b"l":
+			bin_len = int.from_bytes(reader.read(4), byteorder="big")
+			if section_size and bin_len > section_size:
+				log("WARNING: a section is bigger than the section size of its file. Created file may be corrupt. (" + file_name + ")")
+		
+		# Precision of the next section (since version 9)
+		elif byte == b"p" and version >= PRECISION_VERSION:
+			precision = int.from_bytes(reader.read(1), byteorder="big")
+		
+		# Checksum of the next section (since version 10)
+		elif byte == b"c" and version >= CHECKSUM_VERSION:
+			checksum = int.from_bytes(reader.read(4), byteorder="big")
+		
+		# Start of section binary (values of the coding)
+		elif byte == b"s":
+			# Check for file name
+			if file is None:
+				file_name = next_generic_name(outputs.files)
+				log("WARNING: a file does not have a name. Defaulting to " + file_name)
+				file = outputs.open(file_name)
+			
+			# A truncated file only gets the values that are actually there (whole complex numbers for CODING_FULL)
+			dtype, values = section_format(version, coding, bin_len, precision)
+			size = np.dtype(dtype).itemsize * (2 if coding == CODING_FULL else 1)
+			payload = reader.read(values * np.dtype(dtype).itemsize)
+			sections.append(np.frombuffer(payload[:len(payload) - len(payload) % size], dtype=dtype))
+			checksums.append(-1 if checksum is None else checksum)
+			precision = 0
+			checksum = None
+			count += 1
+			buffered += bin_len
+			if buffered >= CHUNK_SIZE:
+				write_buffered()
+				buffered = 0
+		
+		# Anything else is just skipped
+	
+	if not file is None:
+		finish_file()
+
+# =====================================================================================================================
+
+class Outputs:
+	# Where decoded files go: a folder on disk, or bytes kept in memory when there is no folder
+	def __init__(self, folder):
+		self.folder = folder
+		self.files = dict() # file name -> path or bytes
+		self.preallocated = set() # names of files that were given their size up front
+		if not folder is None:
+			os.makedirs(folder, exist_ok=True)
+	
+	def open(self, name, size=None):
+		# size is how big the file is going to be if that is known, which gets the space for it allocated in one go
+		# (where the system can do that)
+		if self.folder is None:
+			self.files[name] = b""
+			return io.BytesIO()
+		self.files[name] = os.path.join(self.folder, name)
+		file = open(self.files[name], "wb", buffering=CHUNK_SIZE)
+		if size and hasattr(os, "posix_fallocate"):
+			try:
+				os.posix_fallocate(file.fileno(), 0, size)
+				self.preallocated.add(name)
+			except OSError:
+				pass # e.g. not supported by the file system, it just grows as it is written then
+		return file
+	
+	def close(self, name, file):
+		if self.folder is None:
+			self.files[name] = file.getvalue()
+		elif name in self.preallocated:
+			# A corrupt container can give less than its size said, which mustn't leave null bytes at the end
+			file.truncate()
+			self.preallocated.discard(name)
+		file.close()
+
+class _Body:
+	# Random access to the (decrypted) body of a container in a seekable file
+	def __init__(self, f, start, cipher):
+		self.f = f
+		self.start = start
+		self.cipher = cipher
+		try:
+			self.length = f.seek(0, io.SEEK_END) - start
+		except (AttributeError, OSError, io.UnsupportedOperation):
+			raise FEFError("The file has to be seekable to be read from the middle!")
+		self.index_offset = None
+	
+	def read(self, offset, n):
+		self.f.seek(self.start + offset)
+		data = self.f.read(n)
+		if not self.cipher is None:
+			data = self.cipher.crypt(data, offset)
+		return data
+	
+	def index(self):
+		# Reads the index through the footer at the very end
+		if self.length < FOOTER_SIZE:
+			raise FEFError("Invalid FEF file!")
+		self.index_offset = struct.unpack(">Q", self.read(self.length - FOOTER_SIZE, FOOTER_SIZE))[0]
+		if self.index_offset > self.length - FOOTER_SIZE:
+			raise FEFError("Invalid index! The file may be corrupt or the password may be wrong.")
+		return parse_index(self.read(self.index_offset, self.length - FOOTER_SIZE - self.index_offset))
+
+def _parse_index(f, version, encrypted, start, header, password, cipher, log):
+	# Builds the index of a container without one by parsing all of it
+	data = _read_all(None, f, encrypted, start, header, password, cipher, log)
+	entries = []
+	for name, raw in parse_sections(data, version, start, log).items():
+		entries.append(IndexEntry(name, int(raw.lengths().sum()), len(raw), None))
+	return entries
+
+def _read_all(src, f, encrypted, start, header, password, cipher, log):
+	# Returns the whole container (after the header has been read from f) with its body decrypted
+	# The whole file is mapped into memory, sections are sliced straight out of the mapping without copying
+	if isinstance(src, (bytes, bytearray)):
+		data = src
+	elif _is_regular_file(f):
+		data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	else:
+		data = header + f.read()
+	
+	# Decrypt the file
+	if encrypted:
+		log("Decrypting file")
+		if cipher:
+			decoded = cipher.crypt(data[start:], 0)
+		else:
+			decoded, key_o = crypt_blocks(serpent.decrypt_block, data[start:], password, 0)
+		data = header + decoded
+	return data
+
+def _write_files(raw_files, outputs, jobs, log):
+	# Decodes and writes every file of a parsed container, a file per thread when there is more than one job (numpy's fft
+	# and writing files let go of the GIL). Everything is reported in the order the files are stored whatever order they
+	# finish in, and a file that fails doesn't stop the others.
+	def write_file(name):
+		raw = raw_files[name]
+		file = outputs.open(name, int(raw.lengths().sum()))
+		try:
+			return write_sections(file, raw.groups(), raw.coding, raw.checksums)
+		finally:
+			outputs.close(name, file)
+	
+	names = list(raw_files)
+	pool = None
+	if jobs > 1 and len(names) > 1:
+		pool = futures.ThreadPoolExecutor(min(jobs, len(names)))
+	try:
+		pending = [pool.submit(write_file, name) for name in names] if pool else None
+		failed = []
+		for i, name in enumerate(names):
+			try:
+				bad = pending[i].result() if pool else write_file(name)
+			except Exception as e:
+				log("ERROR: " + name + " could not be decoded (" + str(e) + ")")
+				failed.append(name)
+				continue
+			_warn_bad(name, bad, log)
+	finally:
+		if pool:
+			pool.shutdown()
+	
+	# Files are added as they are opened, put them back in their order (without the ones that failed)
+	outputs.files = {name: outputs.files[name] for name in names if name in outputs.files and not name in failed}
+	if len(failed) > 0:
+		error = DecodeFailed("Could not decode " + ", ".join(failed) + "!")
+		error.files = outputs.files
+		error.failed = failed
+		raise error
+
+def _check_index(data, start, raw_files, log):
+	# BadSection for the index of a whole (decrypted) container if it is missing or doesn't list exactly the files
+	# parse_sections found in it (with their lengths, numbers of sections and where they start)
+	footer = len(data) - FOOTER_SIZE
+	index_offset = start + struct.unpack(">Q", bytes(data[footer:]))[0] if footer >= start else None
+	try:
+		if index_offset is None or index_offset > footer:
+			raise FEFError("Invalid index!")
+		entries = parse_index(bytes(data[index_offset:footer]))
+	except FEFError:
+		log("WARNING: the index is missing or invalid. The file may be corrupt or the password may be wrong.")
+		return [BadSection(None, None, None, None, "invalid index")]
+	
+	bad = []
+	for entry in entries:
+		raw = raw_files.get(entry.name)
+		if raw is None or not entry.length == int(raw.lengths().sum()) or not entry.sections == len(raw) \
+				or not (start + entry.offset < footer and data[start + entry.offset] == MARK_FILE):
+			bad.append(BadSection(entry.name, None, None, None, "index does not match"))
+	listed = set(entry.name for entry in entries)
+	bad += [BadSection(name, None, None, None, "not in the index") for name in raw_files if not name in listed]
+	for problem in bad:
+		log("WARNING: " + problem.name + " does not match the index")
+	return bad
+
+def _check_sections(args):
+	# Runs in a worker: numbers of the sections in a batch that don't match their checksums, and what stopped them from
+	# being decoded if something did (None otherwise), so that a corrupt container still gets a report
+	try:
+		return write_sections(None, *args), None
+	except Exception as e:
+		return [], str(e)
+
+def _warn_bad(name, numbers, log):
+	for i in numbers:
+		log("WARNING: section " + str(i) + " of " + name + " does not match its checksum. Created file may be corrupt.")
+
+def _open_source(src):
+	# Returns a binary file object for a path, bytes or file object and whether it has to be closed by us
+	if isinstance(src, (str, os.PathLike)):
+		try:
+			return open(src, "rb"), True
+		except OSError:
+			raise FEFError("File does not exist!")
+	elif isinstance(src, (bytes, bytearray, memoryview)):
+		return io.BytesIO(src), True
+	return src, False
+
+def _read_header(f, password, jobs, log):
+	# Reads and checks the header, returns version, whether it is encrypted, where the body starts, the header bytes and
+	# the counter mode cipher (with a process pool if there is more than one job)
+	header = f.read(5)
+	version, encrypted = check_header(header, log)
+	# An empty password is no password, the same as for encode (which doesn't encrypt with one)
+	if encrypted and not password:
+		raise PasswordRequired("this file appears to be password encrypted, but no password was provided!")
+	
+	# Counter mode needs the nonce (and since version 11 the salt and iterations) after the header
+	start = body_start(version, encrypted)
+	header += f.read(start - len(header))
+	cipher = None
+	if encrypted and version >= CTR_VERSION:
+		if len(header) < start:
+			raise FEFError("Invalid header!")
+		key = header_key(version, header, password)
+		jobs = jobs or os.cpu_count()
+		pool = None if jobs == 1 else futures.ProcessPoolExecutor(jobs)
+		cipher = CTRCipher(key, bytes(header[5 : 5+NONCE_SIZE]), pool, jobs)
+	return version, encrypted, start, header, cipher
+
+def _quiet(message):
+	pass
+
+def _is_regular_file(f):
+	# Whether f is a file on disk (which can be memory-mapped)
+	try:
+		return stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+	except (AttributeError, OSError, io.UnsupportedOperation):
+		return False
@@ -0,0 +1,428 @@
+# Turns files into a FEF container
+
+import collections
+import io
+import os
+import stat
+import struct
+import zlib
+
+from .container import MAGIC, KDF_ITERATIONS, NONCE_SIZE, SALT_SIZE, VERSION, CODING_HALF, CODING_INT, INT16_LENGTH, PRECISIONS, CTRCipher, FEFError
+from .container import IndexEntry, header_key, index_bytes, int_scale, kdf_header, section_format
+from .decoder import section_bytes
+from .lazy import lazy_import
+
+np = lazy_import("numpy") # only imported once something is encoded
+futures = lazy_import("concurrent.futures") # these two only with more than one job
+shared_memory = lazy_import("multiprocessing.shared_memory")
+
+SECTION_SIZE = 64 # number of bytes per section
+CHUNK_SIZE = 1 << 20 # how many bytes are read, transformed and written at a time (bounds memory use)
+MAX_SECTION_SIZE = CHUNK_SIZE # a section has to fit in a chunk
+AUTO_MIN = 64 # smallest section size "auto" picks
+AUTO_MAX = 4096 # biggest section size "auto" picks
+
+# =====================================================================================================================
+
+# Encodes files into a FEF container
+#   inputs: paths (which are also used as the stored names) or (name, source) pairs where the source is bytes or a
+#           readable binary file object
+#           (name, source, section_size) triples give a file its own section size
+#   out: path or writable binary file object to write the container to, if None the container is returned as bytes
+#   password: encrypts the container
+#   section_size: number of bytes per section (1 to MAX_SECTION_SIZE), or "auto" to pick one for every file
+#   quantize: stores the coefficients as integers instead of float16 (the same size, but exact by construction)
+#   jobs: number of processes transforming chunks at the same time (0 uses every CPU), the output doesn't change
+#   log: called with progress and warning messages (e.g. print)
+def encode(inputs, out=None, password=None, section_size=SECTION_SIZE, quantize=False, jobs=1, log=None):
+	log = log or _quiet
+	
+	# Open output
+	if out is None:
+		output = io.BytesIO()
+	elif isinstance(out, (str, os.PathLike)):
+		output = open(out, "wb")
+	else:
+		output = out
+	
+	try:
+		# Write file header (FEF, version, encryption flag, nonce, salt and iterations)
+		header = MAGIC + bytes([VERSION, 0 if not password else 1])
+		if password:
+			nonce = os.urandom(NONCE_SIZE)
+			header += nonce + kdf_header(os.urandom(SALT_SIZE), KDF_ITERATIONS)
+		output.write(header)
+		
+		# Every file is streamed CHUNK_SIZE bytes at a time, so only one chunk (per job) is ever in memory
+		# Everything after the header is encrypted while it is written
+		if jobs == 1:
+			chunks = _SerialChunks(output)
+		else:
+			chunks = _ParallelChunks(output, jobs or os.cpu_count())
+		if password:
+			# The key is derived once here and the same expanded key schedule is used for every block
+			chunks.cipher = CTRCipher(header_key(VERSION, header, password), nonce, chunks.pool, chunks.jobs)
+		
+		try:
+			log("Encoding files")
+			entries = []
+			for item in inputs:
+				name, f, close, size = _open_source(item, section_size)
+				try:
+					log(name)
+					entries.append(_encode_file(chunks, name, f, size, CODING_INT if quantize else CODING_HALF))
+				finally:
+					if close:
+						f.close()
+			
+			chunks.write(b"E") # End of file
+			chunks.finish()
+			
+			# Index of the files and where it starts, so files can be found without reading everything
+			index_offset = chunks.offset
+			chunks.write(index_bytes([entry._replace(offset=entry.offset[0]) for entry in entries]))
+			chunks.write(struct.pack(">Q", index_offset))
+			chunks.finish()
+		finally:
+			chunks.close()
+	except:
+		# Don't leave half a container behind
+		if not output is out:
+			output.close()
+			if not out is None:
+				os.remove(out)
+		raise
+	
+	if out is None:
+		return output.getvalue()
+	if not output is out:
+		output.close()
+
+def _encode_file(chunks, name, f, section_size, coding):
+	# Returns the index entry of the file (with the offset as a chunks.mark())
+	# The number of sections has to be written before them, so it comes from the file size
+	length = _source_length(f)
+	if length is None:
+		f = io.BytesIO(f.read())
+		length = len(f.getbuffer())
+	section_size = check_section_size(section_size, length, coding)
+	
+	# Write file flag
+	offset = chunks.mark()
+	chunks.write(b"F") # File start
+	
+	# Write file name
+	chunks.write(b"N") # Name of file
+	chunks.write(bytearray(name, encoding="UTF-8"))
+	chunks.write(b"\x00") # null
+	
+	# Write length of all sections
+	chunks.write(b"L") # Length of section array (number of sections)
+	sections = -(-length // section_size)
+	chunks.write(bytearray(struct.pack(">I", sections)))
+	chunks.write(b"Z") # Size of sections (number of bytes, the last section may be shorter)
+	chunks.write(bytearray(struct.pack(">I", section_size)))
+	chunks.write(b"C") # Coding of the sections
+	chunks.write(bytes([coding]))
+	chunks.write(b"S") # Start of sections
+	
+	# Write sections (l = length of section, c = checksum of its bytes, s = start of section, then its values)
+	done = 0
+	while done < length:
+		# Read chunk
+		buffer = chunks.buffer()
+		n = _read_full(f, buffer[:min(length - done, CHUNK_SIZE // section_size * section_size)])
+		if n == 0:
+			raise FEFError("File " + name + " changed while it was being read!")
+		chunks.encode(n, section_size, coding)
+		done += n
+	return IndexEntry(name, length, sections, offset)
+
+def check_section_size(section_size, length, coding):
+	# Validates a section size, "auto" becomes a power of two that fits the file
+	# Bigger sections mean fewer l/s headers and fewer (bigger) ffts, so auto goes as big as AUTO_MAX unless the file is
+	# smaller than that. float16 coefficients still give back every byte at these sizes. Quantized coefficients need
+	# twice the space above INT16_LENGTH, so they stay at that.
+	if section_size == "auto":
+		size = AUTO_MIN
+		while size < (INT16_LENGTH if coding == CODING_INT else AUTO_MAX) and size < length:
+			size *= 2
+		return size
+	if not isinstance(section_size, int) or section_size < 1 or section_size > MAX_SECTION_SIZE:
+		raise FEFError("Invalid section size (" + str(section_size) + ")! It has to be 1 to " + str(MAX_SECTION_SIZE) + " or auto")
+	return section_size
+
+def records_size(n, section_size, coding):
+	# Most bytes the records of n input bytes can take up
+	full, tail = divmod(n, section_size)
+	return full * record_size(section_size, coding) + (record_size(tail, coding) if tail else 0)
+
+def record_size(length, coding):
+	# Most bytes the record of a section can take up (with a precision tag and the biggest precision)
+	if coding == CODING_HALF:
+		return 13 + np.dtype(PRECISIONS[-1]).itemsize * length
+	dtype, count = section_format(VERSION, coding, length)
+	return 11 + np.dtype(dtype).itemsize * count
+
+def encode_chunk(data, section_size, coding, records):
+	# Turns a chunk of signed ints into records, written into the uint8 array records (at least records_size long)
+	# Returns the number of bytes written
+	# Every full section goes through one rfft as a row of a 2D matrix, a shorter last section needs its own
+	full = len(data) // section_size
+	size = 0
+	if full:
+		size = section_records(data[:full * section_size].reshape(full, section_size), coding, records)
+	tail = len(data) % section_size
+	if tail:
+		size += section_records(data[full * section_size:].reshape(1, tail), coding, records[size:])
+	return size
+
+def section_values(sections, coding):
+	# Turns a 2D matrix of sections (one per row) into the values that are stored for them (see container.py)
+	# Returns a list of (precision, row numbers, values) for every precision that is used
+	length = sections.shape[1]
+	spectrum = np.fft.rfft(sections, axis=1, norm="forward").view(np.float64)
+	values = np.concatenate((spectrum[:, :1], spectrum[:, 2 : length+1]), axis=1)
+	rows = np.arange(len(sections))
+	
+	if coding == CODING_INT:
+		dtype, count = section_format(VERSION, coding, length)
+		limits = np.iinfo(dtype)
+		return [(0, rows, np.clip(np.rint(values * int_scale(length)), limits.min, limits.max).astype(dtype))]
+	
+	# float16 doesn't give back every byte of every section, so all of them are decoded again the same way the decoder
+	# does it and the ones that don't come back go up to float32, then float64 (which the values were computed in)
+	groups = []
+	for precision, dtype in enumerate(PRECISIONS):
+		stored = values.astype(dtype)
+		if precision == len(PRECISIONS) - 1:
+			exact = np.ones(len(rows), dtype=bool)
+		else:
+			exact = np.all(section_bytes(stored, length, coding) == sections, axis=1)
+		if np.any(exact):
+			groups.append((precision, rows[exact], stored[exact]))
+		if np.all(exact):
+			return groups
+		rows, values, sections = rows[~exact], values[~exact], sections[~exact]
+
+def section_records(sections, coding, records):
+	# Writes the records of a 2D matrix of sections (one per row) into records, returns the number of bytes written
+	count, length = sections.shape
+	checksums = section_checksums(sections)
+	groups = section_values(sections, coding)
+	if len(groups) == 1 and groups[0][0] == 0:
+		# Every record has the same size, so they are just rows of a matrix
+		size = 11 + groups[0][2].nbytes // count
+		fill_records(records[:count * size].reshape(count, size), b"l" + struct.pack(">I", length), checksums, groups[0][2])
+		return count * size
+	
+	# Sections at another precision get a "p" tag and bigger values, so every record goes where the sizes before it say
+	heads = dict()
+	sizes = np.empty(count, dtype=np.int64)
+	for precision, rows, values in groups:
+		heads[precision] = b"l" + struct.pack(">I", length) + (b"p" + bytes([precision]) if precision else b"")
+		sizes[rows] = len(heads[precision]) + 6 + values.nbytes // len(rows)
+	starts = np.cumsum(sizes) - sizes
+	for precision, rows, values in groups:
+		group = np.empty((len(rows), sizes[rows[0]]), dtype=np.uint8)
+		fill_records(group, heads[precision], checksums[rows], values)
+		records[starts[rows, None] + np.arange(group.shape[1])] = group
+	return int(sizes.sum())
+
+def fill_records(records, head, checksums, values):
+	# Fills every row of records with head, "c" + checksum, "s" and the values of a section
+	n = len(head)
+	records[:, :n] = np.frombuffer(head, dtype=np.uint8)
+	records[:, n] = ord("c")
+	records[:, n+1 : n+5] = checksums.view(np.uint8).reshape(len(checksums), 4)
+	records[:, n+5] = ord("s")
+	records[:, n+6:] = values.view(np.uint8).reshape(len(values), -1)
+
+def section_checksums(sections):
+	# CRC32 of the bytes of every section (one per row)
+	return np.array([zlib.crc32(section) for section in sections], dtype=">u4")
+
+# =====================================================================================================================
+
+# Chunk pipelines
+# _encode_file reads every chunk into buffer() and hands it over with encode() along with the section size and coding of
+# the file, everything else goes through write().
+# Output always comes out in the order it went in, encrypted with cipher (a CTRCipher) if there is one when it is
+# written. offset keeps track of where in the body the next piece of output goes, and mark() gives a one item list that
+# gets the offset of whatever is written next once it is known (after finish() at the latest).
+
+class _SerialChunks:
+	# Transforms chunks right away, all in the same buffer
+	def __init__(self, writer):
+		self.writer = writer
+		self.input = memoryview(bytearray(CHUNK_SIZE))
+		self.cipher = None
+		self.offset = 0
+		self.pool = None
+		self.jobs = 1
+	
+	def buffer(self):
+		return self.input
+	
+	def encode(self, n, section_size, coding):
+		records = np.empty(records_size(n, section_size, coding), dtype=np.uint8)
+		size = encode_chunk(np.frombuffer(self.input[:n], dtype=np.int8), section_size, coding, records)
+		self.write(records[:size])
+	
+	def write(self, data):
+		if not self.cipher is None:
+			data = self.cipher.crypt(data, self.offset)
+		self.offset += len(data)
+		self.writer.write(data)
+	
+	def mark(self):
+		return [self.offset]
+	
+	def finish(self):
+		pass
+	
+	def close(self):
+		pass
+
+class _ParallelChunks:
+	# Transforms chunks in a process pool. Chunks go to the workers and come back through shared memory, and at most
+	# two chunks per job are in flight so memory stays bounded. How big the records of a chunk are is only known once
+	# the worker is done, so they are encrypted (with the pool as well) when they are written.
+	def __init__(self, writer, jobs):
+		self.writer = writer
+		self.jobs = jobs
+		self.pool = futures.ProcessPoolExecutor(jobs)
+		self.pending = collections.deque() # (future, input memory, output memory), bytes or a mark
+		self.input = None # shared memory the next chunk is read into
+		self.cipher = None
+		self.offset = 0
+	
+	def buffer(self):
+		if self.input is None:
+			self.input = shared_memory.SharedMemory(create=True, size=CHUNK_SIZE)
+		return self.input.buf
+	
+	def encode(self, n, section_size, coding):
+		output = shared_memory.SharedMemory(create=True, size=max(records_size(n, section_size, coding), 1))
+		future = self.pool.submit(_encode_shared, self.input.name, n, output.name, section_size, coding)
+		self.pending.append((future, self.input, output))
+		self.input = None
+		
+		while len(self.pending) >= self.jobs * 2:
+			self._write_next()
+	
+	def write(self, data):
+		if len(self.pending) == 0:
+			self._output(data)
+		else:
+			self.pending.append(bytes(data))
+	
+	def mark(self):
+		mark = [self.offset]
+		if len(self.pending) > 0:
+			self.pending.append(mark)
+		return mark
+	
+	def finish(self):
+		while len(self.pending) > 0:
+			self._write_next()
+	
+	def close(self):
+		# Gets rid of everything, even if something went wrong
+		chunks = [item for item in self.pending if isinstance(item, tuple)]
+		for future, input, output in chunks:
+			future.cancel()
+		self.pool.shutdown()
+		for future, input, output in chunks:
+			_release(input, output)
+		self.pending.clear()
+		if not self.input is None:
+			_release(self.input)
+			self.input = None
+	
+	def _write_next(self):
+		item = self.pending.popleft()
+		if isinstance(item, list):
+			item[0] = self.offset
+			return
+		if isinstance(item, bytes):
+			self._output(item)
+			return
+		future, input, output = item
+		try:
+			n = future.result()
+			with output.buf[:n] as records:
+				self._output(records)
+		finally:
+			_release(input, output)
+	
+	def _output(self, data):
+		if not self.cipher is None:
+			data = self.cipher.crypt(data, self.offset)
+		self.offset += len(data)
+		self.writer.write(data)
+
+def _encode_shared(input_name, n, output_name, section_size, coding):
+	# Runs in a worker: encodes n bytes from one shared memory block into another, returns the size of the records
+	input = shared_memory.SharedMemory(input_name)
+	output = shared_memory.SharedMemory(output_name)
+	try:
+		data = np.frombuffer(input.buf, dtype=np.int8, count=n)
+		records = np.frombuffer(output.buf, dtype=np.uint8, count=records_size(n, section_size, coding))
+		size = encode_chunk(data, section_size, coding, records)
+		del data, records # views have to be gone before the memory can be closed
+		return size
+	finally:
+		input.close()
+		output.close()
+
+def _release(*memory):
+	for m in memory:
+		m.close()
+		m.unlink()
+
+# =====================================================================================================================
+
+def _quiet(message):
+	pass
+
+def _open_source(item, section_size):
+	# Returns name, binary file object, whether it has to be closed by us and the section size of the file
+	if isinstance(item, (str, os.PathLike)):
+		try:
+			return os.fsdecode(item), open(item, "rb"), True, section_size
+		except OSError:
+			raise FEFError("Cannot open file " + os.fsdecode(item) + "!")
+	
+	if len(item) == 3:
+		name, source, section_size = item
+	else:
+		name, source = item
+	if isinstance(source, (bytes, bytearray, memoryview)):
+		return name, io.BytesIO(source), True, section_size
+	return name, source, False, section_size
+
+def _source_length(f):
+	# Number of bytes left in a file object, None if that can't be known without reading it
+	try:
+		info = os.fstat(f.fileno())
+		if stat.S_ISREG(info.st_mode):
+			return info.st_size - f.tell()
+	except (AttributeError, OSError, io.UnsupportedOperation):
+		pass
+	if f.seekable():
+		pos = f.tell()
+		end = f.seek(0, io.SEEK_END)
+		f.seek(pos)
+		return end - pos
+	return None
+
+def _read_full(f, view):
+	# readinto until the view is full or the file ends (pipes and raw files may return less than asked for)
+	total = 0
+	while total < len(view):
+		n = f.readinto(view[total:])
+		if not n:
+			break
+		total += n
+	return total
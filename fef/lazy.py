@@ -0,0 +1,23 @@
+# Modules that are only imported once something in them is used
+# numpy takes longer to import than everything else together, and e.g. listing the files of a container or a --help
+# doesn't need it at all, so it is only imported when there is something to transform (or encrypt).
+
+import sys
+
+class LazyModule:
+	# Stands in for a module: the first attribute looked up imports it, and every attribute is kept on this object once
+	# it has been looked up, so using it costs the same as using the module after that
+	def __init__(self, name):
+		self._lazy_name = name
+	
+	def __getattr__(self, attr):
+		__import__(self._lazy_name)
+		value = getattr(sys.modules[self._lazy_name], attr)
+		setattr(self, attr, value)
+		return value
+
+def lazy_import(name):
+	# The module itself if it has already been imported, a LazyModule otherwise
+	if name in sys.modules:
+		return sys.modules[name]
+	return LazyModule(name)
@@ -0,0 +1,1354 @@
+# Implementation of Serpent-1 cipher based on Python 1.5 implementation.
+# The Serpent cipher is in the public domain.
+# 
+# Resources: 
+#   - https://www.cl.cam.ac.uk/~fms27/serpent/serpent.py.html
+#   - https://www.cl.cam.ac.uk/~rja14/Papers/serpent.pdf
+#   - https://en.wikipedia.org/wiki/Serpent_(cipher)
+# 
+# NOTE: all "binary" strings represented in this program are little-endian by spec.
+# I say "binary" because the strings are literally "0"s and "1"s as was written in the original Python implementation.
+
+# We need this to turn numbers into bytes for outputting
+import struct
+# Expanded keys are cached
+import functools
+# Batches of blocks are encrypted as arrays of words (numpy is only imported once that happens)
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# =====================================================================================================================
+
+# Constants
+PHI = 0x9e3779b9 # golden ratio, good for "randomizing"
+ROUNDS = 32 # rounds
+BATCH_BLOCKS = 1 << 14 # blocks encrypted together by encrypt_blocks (small enough for the words to stay in cache)
+
+# Data tables
+# These are just copied from the reference
+
+# Each element of this list corresponds to one S-box. Each S-box in turn is
+# a list of 16 integers in the range 0..15, without repetitions. Having the
+# value v (say, 14) in position p (say, 0) means that if the input to that
+# S-box is the pattern p (0, or 0x0) then the output will be the pattern v
+# (14, or 0xe).
+s_box_decimal_table = [
+	[ 3, 8,15, 1,10, 6, 5,11,14,13, 4, 2, 7, 0, 9,12 ], # S0
+	[15,12, 2, 7, 9, 0, 5,10, 1,11,14, 8, 6,13, 3, 4 ], # S1
+	[ 8, 6, 7, 9, 3,12,10,15,13, 1,14, 4, 0,11, 5, 2 ], # S2
+	[ 0,15,11, 8,12, 9, 6, 3,13, 1, 2, 4,10, 7, 5,14 ], # S3
+	[ 1,15, 8, 3,12, 0,11, 6, 2, 5, 4,10, 9,14, 7,13 ], # S4
+	[15, 5, 2,11, 4,10, 9,12, 0, 3,14, 8,13, 6, 7, 1 ], # S5
+	[ 7, 2,12, 5, 8, 4, 6,11,14, 9, 1,15,13, 3,10, 0 ], # S6
+	[ 1,13,15, 0,14, 8, 2,11, 7, 4,12,10, 9, 3, 5, 6 ], # S7
+]
+# NB: in serpent-0, this was a list of 32 sublists (for the 32 different
+# S-boxes derived from DES). In the final version of Serpent only 8 S-boxes
+# are used, with each one being reused 4 times.
+
+
+# Another version of this table as a list of dictionaries: one
+# dictionary per S-box, where the value of the entry indexed by i tells you
+# the output configuration when the input is i, with both the index and the
+# value being bitstrings.  Also the inverse: another list of
+# dictionaries, one per S-box, where each dictionary gets the output of the
+# S-box as the key and gives you the input, with both values being 4-bit
+# bitstrings.
+# These (and s_box_bytes below) are precomputed from s_box_decimal_table, so nothing has to be built when the module
+# is imported.
+s_box_bitstring = [
+	{ # S0
+		"0000": "1100", "1000": "0001", "0100": "1111", "1100": "1000", "0010": "0101", "1010": "0110", "0110": "1010", "1110": "1101",
+		"0001": "0111", "1001": "1011", "0101": "0010", "1101": "0100", "0011": "1110", "1011": "0000", "0111": "1001", "1111": "0011",
+	},
+	{ # S1
+		"0000": "1111", "1000": "0011", "0100": "0100", "1100": "1110", "0010": "1001", "1010": "0000", "0110": "1010", "1110": "0101",
+		"0001": "1000", "1001": "1101", "0101": "0111", "1101": "0001", "0011": "0110", "1011": "1011", "0111": "1100", "1111": "0010",
+	},
+	{ # S2
+		"0000": "0001", "1000": "0110", "0100": "1110", "1100": "1001", "0010": "1100", "1010": "0011", "0110": "0101", "1110": "1111",
+		"0001": "1011", "1001": "1000", "0101": "0111", "1101": "0010", "0011": "0000", "1011": "1101", "0111": "1010", "1111": "0100",
+	},
+	{ # S3
+		"0000": "0000", "1000": "1111", "0100": "1101", "1100": "0001", "0010": "0011", "1010": "1001", "0110": "0110", "1110": "1100",
+		"0001": "1011", "1001": "1000", "0101": "0100", "1101": "0010", "0011": "0101", "1011": "1110", "0111": "1010", "1111": "0111",
+	},
+	{ # S4
+		"0000": "1000", "1000": "1111", "0100": "0001", "1100": "1100", "0010": "0011", "1010": "0000", "0110": "1101", "1110": "0110",
+		"0001": "0100", "1001": "1010", "0101": "0010", "1101": "0101", "0011": "1001", "1011": "0111", "0111": "1110", "1111": "1011",
+	},
+	{ # S5
+		"0000": "1111", "1000": "1010", "0100": "0100", "1100": "1101", "0010": "0010", "1010": "0101", "0110": "1001", "1110": "0011",
+		"0001": "0000", "1001": "1100", "0101": "0111", "1101": "0001", "0011": "1011", "1011": "0110", "0111": "1110", "1111": "1000",
+	},
+	{ # S6
+		"0000": "1110", "1000": "0100", "0100": "0011", "1100": "1010", "0010": "0001", "1010": "0010", "0110": "0110", "1110": "1101",
+		"0001": "0111", "1001": "1001", "0101": "1000", "1101": "1111", "0011": "1011", "1011": "1100", "0111": "0101", "1111": "0000",
+	},
+	{ # S7
+		"0000": "1000", "1000": "1011", "0100": "1111", "1100": "0000", "0010": "0111", "1010": "0001", "0110": "0100", "1110": "1101",
+		"0001": "1110", "1001": "0010", "0101": "0011", "1101": "0101", "0011": "1001", "1011": "1100", "0111": "1010", "1111": "0110",
+	},
+]
+s_box_bitstring_inverse = [
+	{ # S0
+		"1100": "0000", "0001": "1000", "1111": "0100", "1000": "1100", "0101": "0010", "0110": "1010", "1010": "0110", "1101": "1110",
+		"0111": "0001", "1011": "1001", "0010": "0101", "0100": "1101", "1110": "0011", "0000": "1011", "1001": "0111", "0011": "1111",
+	},
+	{ # S1
+		"1111": "0000", "0011": "1000", "0100": "0100", "1110": "1100", "1001": "0010", "0000": "1010", "1010": "0110", "0101": "1110",
+		"1000": "0001", "1101": "1001", "0111": "0101", "0001": "1101", "0110": "0011", "1011": "1011", "1100": "0111", "0010": "1111",
+	},
+	{ # S2
+		"0001": "0000", "0110": "1000", "1110": "0100", "1001": "1100", "1100": "0010", "0011": "1010", "0101": "0110", "1111": "1110",
+		"1011": "0001", "1000": "1001", "0111": "0101", "0010": "1101", "0000": "0011", "1101": "1011", "1010": "0111", "0100": "1111",
+	},
+	{ # S3
+		"0000": "0000", "1111": "1000", "1101": "0100", "0001": "1100", "0011": "0010", "1001": "1010", "0110": "0110", "1100": "1110",
+		"1011": "0001", "1000": "1001", "0100": "0101", "0010": "1101", "0101": "0011", "1110": "1011", "1010": "0111", "0111": "1111",
+	},
+	{ # S4
+		"1000": "0000", "1111": "1000", "0001": "0100", "1100": "1100", "0011": "0010", "0000": "1010", "1101": "0110", "0110": "1110",
+		"0100": "0001", "1010": "1001", "0010": "0101", "0101": "1101", "1001": "0011", "0111": "1011", "1110": "0111", "1011": "1111",
+	},
+	{ # S5
+		"1111": "0000", "1010": "1000", "0100": "0100", "1101": "1100", "0010": "0010", "0101": "1010", "1001": "0110", "0011": "1110",
+		"0000": "0001", "1100": "1001", "0111": "0101", "0001": "1101", "1011": "0011", "0110": "1011", "1110": "0111", "1000": "1111",
+	},
+	{ # S6
+		"1110": "0000", "0100": "1000", "0011": "0100", "1010": "1100", "0001": "0010", "0010": "1010", "0110": "0110", "1101": "1110",
+		"0111": "0001", "1001": "1001", "1000": "0101", "1111": "1101", "1011": "0011", "1100": "1011", "0101": "0111", "0000": "1111",
+	},
+	{ # S7
+		"1000": "0000", "1011": "1000", "1111": "0100", "0000": "1100", "0111": "0010", "0001": "1010", "0100": "0110", "1101": "1110",
+		"1110": "0001", "0010": "1001", "0011": "0101", "0101": "1101", "1001": "0011", "1100": "1011", "1010": "0111", "0110": "1111",
+	},
+]
+
+# One S-box applied to both nibbles of a byte (the low nibble being the one that comes first), for the packed engine
+s_box_bytes = [
+	bytes.fromhex( # S0
+		"33383f313a36353b3e3d34323730393c83888f818a86858b8e8d84828780898cf3f8fff1faf6f5fbfefdf4f2f7f0f9fc13181f111a16151b1e1d14121710191c"
+		"a3a8afa1aaa6a5abaeada4a2a7a0a9ac63686f616a66656b6e6d64626760696c53585f515a56555b5e5d54525750595cb3b8bfb1bab6b5bbbebdb4b2b7b0b9bc"
+		"e3e8efe1eae6e5ebeeede4e2e7e0e9ecd3d8dfd1dad6d5dbdeddd4d2d7d0d9dc43484f414a46454b4e4d44424740494c23282f212a26252b2e2d24222720292c"
+		"73787f717a76757b7e7d74727770797c03080f010a06050b0e0d04020700090c93989f919a96959b9e9d94929790999cc3c8cfc1cac6c5cbcecdc4c2c7c0c9cc"
+	),
+	bytes.fromhex( # S1
+		"fffcf2f7f9f0f5faf1fbfef8f6fdf3f4cfccc2c7c9c0c5cac1cbcec8c6cdc3c42f2c22272920252a212b2e28262d23247f7c72777970757a717b7e78767d7374"
+		"9f9c92979990959a919b9e98969d93940f0c02070900050a010b0e08060d03045f5c52575950555a515b5e58565d5354afaca2a7a9a0a5aaa1abaea8a6ada3a4"
+		"1f1c12171910151a111b1e18161d1314bfbcb2b7b9b0b5bab1bbbeb8b6bdb3b4efece2e7e9e0e5eae1ebeee8e6ede3e48f8c82878980858a818b8e88868d8384"
+		"6f6c62676960656a616b6e68666d6364dfdcd2d7d9d0d5dad1dbded8d6ddd3d43f3c32373930353a313b3e38363d33344f4c42474940454a414b4e48464d4344"
+	),
+	bytes.fromhex( # S2
+		"88868789838c8a8f8d818e84808b858268666769636c6a6f6d616e64606b656278767779737c7a7f7d717e74707b757298969799939c9a9f9d919e94909b9592"
+		"38363739333c3a3f3d313e34303b3532c8c6c7c9c3cccacfcdc1cec4c0cbc5c2a8a6a7a9a3acaaafada1aea4a0aba5a2f8f6f7f9f3fcfafffdf1fef4f0fbf5f2"
+		"d8d6d7d9d3dcdadfddd1ded4d0dbd5d218161719131c1a1f1d111e14101b1512e8e6e7e9e3eceaefede1eee4e0ebe5e248464749434c4a4f4d414e44404b4542"
+		"08060709030c0a0f0d010e04000b0502b8b6b7b9b3bcbabfbdb1beb4b0bbb5b258565759535c5a5f5d515e54505b555228262729232c2a2f2d212e24202b2522"
+	),
+	bytes.fromhex( # S3
+		"000f0b080c0906030d0102040a07050ef0fffbf8fcf9f6f3fdf1f2f4faf7f5feb0bfbbb8bcb9b6b3bdb1b2b4bab7b5be808f8b888c8986838d8182848a87858e"
+		"c0cfcbc8ccc9c6c3cdc1c2c4cac7c5ce909f9b989c9996939d9192949a97959e606f6b686c6966636d6162646a67656e303f3b383c3936333d3132343a37353e"
+		"d0dfdbd8dcd9d6d3ddd1d2d4dad7d5de101f1b181c1916131d1112141a17151e202f2b282c2926232d2122242a27252e404f4b484c4946434d4142444a47454e"
+		"a0afaba8aca9a6a3ada1a2a4aaa7a5ae707f7b787c7976737d7172747a77757e505f5b585c5956535d5152545a57555ee0efebe8ece9e6e3ede1e2e4eae7e5ee"
+	),
+	bytes.fromhex( # S4
+		"111f18131c101b161215141a191e171df1fff8f3fcf0fbf6f2f5f4faf9fef7fd818f88838c808b868285848a898e878d313f38333c303b363235343a393e373d"
+		"c1cfc8c3ccc0cbc6c2c5c4cac9cec7cd010f08030c000b060205040a090e070db1bfb8b3bcb0bbb6b2b5b4bab9beb7bd616f68636c606b666265646a696e676d"
+		"212f28232c202b262225242a292e272d515f58535c505b565255545a595e575d414f48434c404b464245444a494e474da1afa8a3aca0aba6a2a5a4aaa9aea7ad"
+		"919f98939c909b969295949a999e979de1efe8e3ece0ebe6e2e5e4eae9eee7ed717f78737c707b767275747a797e777dd1dfd8d3dcd0dbd6d2d5d4dad9ded7dd"
+	),
+	bytes.fromhex( # S5
+		"fff5f2fbf4faf9fcf0f3fef8fdf6f7f15f55525b545a595c50535e585d5657512f25222b242a292c20232e282d262721bfb5b2bbb4bab9bcb0b3beb8bdb6b7b1"
+		"4f45424b444a494c40434e484d464741afa5a2aba4aaa9aca0a3aea8ada6a7a19f95929b949a999c90939e989d969791cfc5c2cbc4cac9ccc0c3cec8cdc6c7c1"
+		"0f05020b040a090c00030e080d0607013f35323b343a393c30333e383d363731efe5e2ebe4eae9ece0e3eee8ede6e7e18f85828b848a898c80838e888d868781"
+		"dfd5d2dbd4dad9dcd0d3ded8ddd6d7d16f65626b646a696c60636e686d6667617f75727b747a797c70737e787d7677711f15121b141a191c10131e181d161711"
+	),
+	bytes.fromhex( # S6
+		"77727c757874767b7e79717f7d737a7027222c252824262b2e29212f2d232a20c7c2ccc5c8c4c6cbcec9c1cfcdc3cac057525c555854565b5e59515f5d535a50"
+		"87828c858884868b8e89818f8d838a8047424c454844464b4e49414f4d434a4067626c656864666b6e69616f6d636a60b7b2bcb5b8b4b6bbbeb9b1bfbdb3bab0"
+		"e7e2ece5e8e4e6ebeee9e1efede3eae097929c959894969b9e99919f9d939a9017121c151814161b1e19111f1d131a10f7f2fcf5f8f4f6fbfef9f1fffdf3faf0"
+		"d7d2dcd5d8d4d6dbded9d1dfddd3dad037323c353834363b3e39313f3d333a30a7a2aca5a8a4a6abaea9a1afada3aaa007020c050804060b0e09010f0d030a00"
+	),
+	bytes.fromhex( # S7
+		"111d1f101e18121b17141c1a19131516d1dddfd0ded8d2dbd7d4dcdad9d3d5d6f1fdfff0fef8f2fbf7f4fcfaf9f3f5f6010d0f000e08020b07040c0a09030506"
+		"e1edefe0eee8e2ebe7e4eceae9e3e5e6818d8f808e88828b87848c8a89838586212d2f202e28222b27242c2a29232526b1bdbfb0beb8b2bbb7b4bcbab9b3b5b6"
+		"717d7f707e78727b77747c7a79737576414d4f404e48424b47444c4a49434546c1cdcfc0cec8c2cbc7c4cccac9c3c5c6a1adafa0aea8a2aba7a4acaaa9a3a5a6"
+		"919d9f909e98929b97949c9a99939596313d3f303e38323b37343c3a39333536515d5f505e58525b57545c5a59535556616d6f606e68626b67646c6a69636566"
+	),
+]
+s_box_bytes_inverse = [
+	bytes.fromhex( # S0
+		"ddd3dbd0dad6d5dcd1ded4d7dfd9d8d23d333b303a36353c313e34373f393832bdb3bbb0bab6b5bcb1beb4b7bfb9b8b20d030b000a06050c010e04070f090802"
+		"ada3aba0aaa6a5aca1aea4a7afa9a8a26d636b606a66656c616e64676f6968625d535b505a56555c515e54575f595852cdc3cbc0cac6c5ccc1cec4c7cfc9c8c2"
+		"1d131b101a16151c111e14171f191812ede3ebe0eae6e5ece1eee4e7efe9e8e24d434b404a46454c414e44474f4948427d737b707a76757c717e74777f797872"
+		"fdf3fbf0faf6f5fcf1fef4f7fff9f8f29d939b909a96959c919e94979f9998928d838b808a86858c818e84878f8988822d232b202a26252c212e24272f292822"
+	),
+	bytes.fromhex( # S1
+		"5558525e5f565c535b545759515d5a508588828e8f868c838b848789818d8a802528222e2f262c232b242729212d2a20e5e8e2eeefe6ece3ebe4e7e9e1edeae0"
+		"f5f8f2fefff6fcf3fbf4f7f9f1fdfaf06568626e6f666c636b646769616d6a60c5c8c2cecfc6ccc3cbc4c7c9c1cdcac03538323e3f363c333b343739313d3a30"
+		"b5b8b2bebfb6bcb3bbb4b7b9b1bdbab04548424e4f464c434b444749414d4a407578727e7f767c737b747779717d7a709598929e9f969c939b949799919d9a90"
+		"1518121e1f161c131b141719111d1a10d5d8d2dedfd6dcd3dbd4d7d9d1dddad0a5a8a2aeafa6aca3aba4a7a9a1adaaa00508020e0f060c030b040709010d0a00"
+	),
+	bytes.fromhex( # S2
+		"ccc9cfc4cbcec1c2c0c3c6cdc5c8cac79c999f949b9e91929093969d95989a97fcf9fff4fbfef1f2f0f3f6fdf5f8faf74c494f444b4e41424043464d45484a47"
+		"bcb9bfb4bbbeb1b2b0b3b6bdb5b8bab7ece9efe4ebeee1e2e0e3e6ede5e8eae71c191f141b1e11121013161d15181a172c292f242b2e21222023262d25282a27"
+		"0c090f040b0e01020003060d05080a073c393f343b3e31323033363d35383a376c696f646b6e61626063666d65686a67dcd9dfd4dbded1d2d0d3d6ddd5d8dad7"
+		"5c595f545b5e51525053565d55585a578c898f848b8e81828083868d85888a87aca9afa4abaea1a2a0a3a6ada5a8aaa77c797f747b7e71727073767d75787a77"
+	),
+	bytes.fromhex( # S3
+		"00090a070b0e060d03050c0204080f0190999a979b9e969d93959c9294989f91a0a9aaa7abaea6ada3a5aca2a4a8afa170797a777b7e767d73757c7274787f71"
+		"b0b9bab7bbbeb6bdb3b5bcb2b4b8bfb1e0e9eae7ebeee6ede3e5ece2e4e8efe160696a676b6e666d63656c6264686f61d0d9dad7dbded6ddd3d5dcd2d4d8dfd1"
+		"30393a373b3e363d33353c3234383f3150595a575b5e565d53555c5254585f51c0c9cac7cbcec6cdc3c5ccc2c4c8cfc120292a272b2e262d23252c2224282f21"
+		"40494a474b4e464d43454c4244484f4180898a878b8e868d83858c8284888f81f0f9faf7fbfef6fdf3f5fcf2f4f8fff110191a171b1e161d13151c1214181f11"
+	),
+	bytes.fromhex( # S4
+		"555058535a59575e525c5b56545f5d51050008030a09070e020c0b06040f0d01858088838a89878e828c8b86848f8d81353038333a39373e323c3b36343f3d31"
+		"a5a0a8a3aaa9a7aea2acaba6a4afada1959098939a99979e929c9b96949f9d91757078737a79777e727c7b76747f7d71e5e0e8e3eae9e7eee2ecebe6e4efede1"
+		"252028232a29272e222c2b26242f2d21c5c0c8c3cac9c7cec2cccbc6c4cfcdc1b5b0b8b3bab9b7beb2bcbbb6b4bfbdb1656068636a69676e626c6b66646f6d61"
+		"454048434a49474e424c4b46444f4d41f5f0f8f3faf9f7fef2fcfbf6f4fffdf1d5d0d8d3dad9d7ded2dcdbd6d4dfddd1151018131a19171e121c1b16141f1d11"
+	),
+	bytes.fromhex( # S5
+		"888f828984818d8e8b868583878c8a80f8fff2f9f4f1fdfefbf6f5f3f7fcfaf0282f222924212d2e2b262523272c2a20989f929994919d9e9b969593979c9a90"
+		"484f424944414d4e4b464543474c4a40181f121914111d1e1b161513171c1a10d8dfd2d9d4d1dddedbd6d5d3d7dcdad0e8efe2e9e4e1edeeebe6e5e3e7eceae0"
+		"b8bfb2b9b4b1bdbebbb6b5b3b7bcbab0686f626964616d6e6b666563676c6a60585f525954515d5e5b565553575c5a50383f323934313d3e3b363533373c3a30"
+		"787f727974717d7e7b767573777c7a70c8cfc2c9c4c1cdcecbc6c5c3c7cccac0a8afa2a9a4a1adaeaba6a5a3a7acaaa0080f020904010d0e0b060503070c0a00"
+	),
+	bytes.fromhex( # S6
+		"fffaf1fdf5f3f6f0f4f9fef7f2fcf8fbafaaa1ada5a3a6a0a4a9aea7a2aca8ab1f1a111d1513161014191e17121c181bdfdad1ddd5d3d6d0d4d9ded7d2dcd8db"
+		"5f5a515d5553565054595e57525c585b3f3a313d3533363034393e37323c383b6f6a616d6563666064696e67626c686b0f0a010d0503060004090e07020c080b"
+		"4f4a414d4543464044494e47424c484b9f9a919d9593969094999e97929c989befeae1ede5e3e6e0e4e9eee7e2ece8eb7f7a717d7573767074797e77727c787b"
+		"2f2a212d2523262024292e27222c282bcfcac1cdc5c3c6c0c4c9cec7c2ccc8cb8f8a818d8583868084898e87828c888bbfbab1bdb5b3b6b0b4b9beb7b2bcb8bb"
+	),
+	bytes.fromhex( # S7
+		"3330363d393e3f38353c3b373a3134320300060d090e0f08050c0b070a0104026360666d696e6f68656c6b676a616462d3d0d6ddd9dedfd8d5dcdbd7dad1d4d2"
+		"9390969d999e9f98959c9b979a919492e3e0e6ede9eeefe8e5ecebe7eae1e4e2f3f0f6fdf9fefff8f5fcfbf7faf1f4f28380868d898e8f88858c8b878a818482"
+		"5350565d595e5f58555c5b575a515452c3c0c6cdc9cecfc8c5cccbc7cac1c4c2b3b0b6bdb9bebfb8b5bcbbb7bab1b4b27370767d797e7f78757c7b777a717472"
+		"a3a0a6ada9aeafa8a5acaba7aaa1a4a21310161d191e1f18151c1b171a1114124340464d494e4f48454c4b474a4144422320262d292e2f28252c2b272a212422"
+	),
+]
+
+
+# The Initial and Final permutations are each represented by one list
+# containing the integers in 0..127 without repetitions.  Having value v
+# (say, 32) at position p (say, 1) means that the output bit at position p
+# (1) comes from the input bit at position v (32).
+ip_table = [
+	0, 32, 64, 96, 1, 33, 65, 97, 2, 34, 66, 98, 3, 35, 67, 99,
+	4, 36, 68, 100, 5, 37, 69, 101, 6, 38, 70, 102, 7, 39, 71, 103,
+	8, 40, 72, 104, 9, 41, 73, 105, 10, 42, 74, 106, 11, 43, 75, 107,
+	12, 44, 76, 108, 13, 45, 77, 109, 14, 46, 78, 110, 15, 47, 79, 111,
+	16, 48, 80, 112, 17, 49, 81, 113, 18, 50, 82, 114, 19, 51, 83, 115,
+	20, 52, 84, 116, 21, 53, 85, 117, 22, 54, 86, 118, 23, 55, 87, 119,
+	24, 56, 88, 120, 25, 57, 89, 121, 26, 58, 90, 122, 27, 59, 91, 123,
+	28, 60, 92, 124, 29, 61, 93, 125, 30, 62, 94, 126, 31, 63, 95, 127,
+]
+fp_table = [
+	0, 4, 8, 12, 16, 20, 24, 28, 32, 36, 40, 44, 48, 52, 56, 60,
+	64, 68, 72, 76, 80, 84, 88, 92, 96, 100, 104, 108, 112, 116, 120, 124,
+	1, 5, 9, 13, 17, 21, 25, 29, 33, 37, 41, 45, 49, 53, 57, 61,
+	65, 69, 73, 77, 81, 85, 89, 93, 97, 101, 105, 109, 113, 117, 121, 125,
+	2, 6, 10, 14, 18, 22, 26, 30, 34, 38, 42, 46, 50, 54, 58, 62,
+	66, 70, 74, 78, 82, 86, 90, 94, 98, 102, 106, 110, 114, 118, 122, 126,
+	3, 7, 11, 15, 19, 23, 27, 31, 35, 39, 43, 47, 51, 55, 59, 63,
+	67, 71, 75, 79, 83, 87, 91, 95, 99, 103, 107, 111, 115, 119, 123, 127,
+ ]
+
+# The Linear Transformation is represented as a list of 128 lists, one for
+# each output bit. Each one of the 128 lists is composed of a variable
+# number of integers in 0..127 specifying the positions of the input bits
+# that must be XORed together (say, 72, 144 and 125) to yield the output
+# bit corresponding to the position of that list (say, 1).
+lt_table = [
+	[16, 52, 56, 70, 83, 94, 105],
+	[72, 114, 125],
+	[2, 9, 15, 30, 76, 84, 126],
+	[36, 90, 103],
+	[20, 56, 60, 74, 87, 98, 109],
+	[1, 76, 118],
+	[2, 6, 13, 19, 34, 80, 88],
+	[40, 94, 107],
+	[24, 60, 64, 78, 91, 102, 113],
+	[5, 80, 122],
+	[6, 10, 17, 23, 38, 84, 92],
+	[44, 98, 111],
+	[28, 64, 68, 82, 95, 106, 117],
+	[9, 84, 126],
+	[10, 14, 21, 27, 42, 88, 96],
+	[48, 102, 115],
+	[32, 68, 72, 86, 99, 110, 121],
+	[2, 13, 88],
+	[14, 18, 25, 31, 46, 92, 100],
+	[52, 106, 119],
+	[36, 72, 76, 90, 103, 114, 125],
+	[6, 17, 92],
+	[18, 22, 29, 35, 50, 96, 104],
+	[56, 110, 123],
+	[1, 40, 76, 80, 94, 107, 118],
+	[10, 21, 96],
+	[22, 26, 33, 39, 54, 100, 108],
+	[60, 114, 127],
+	[5, 44, 80, 84, 98, 111, 122],
+	[14, 25, 100],
+	[26, 30, 37, 43, 58, 104, 112],
+	[3, 118],
+	[9, 48, 84, 88, 102, 115, 126],
+	[18, 29, 104],
+	[30, 34, 41, 47, 62, 108, 116],
+	[7, 122],
+	[2, 13, 52, 88, 92, 106, 119],
+	[22, 33, 108],
+	[34, 38, 45, 51, 66, 112, 120],
+	[11, 126],
+	[6, 17, 56, 92, 96, 110, 123],
+	[26, 37, 112],
+	[38, 42, 49, 55, 70, 116, 124],
+	[2, 15, 76],
+	[10, 21, 60, 96, 100, 114, 127],
+	[30, 41, 116],
+	[0, 42, 46, 53, 59, 74, 120],
+	[6, 19, 80],
+	[3, 14, 25, 100, 104, 118],
+	[34, 45, 120],
+	[4, 46, 50, 57, 63, 78, 124],
+	[10, 23, 84],
+	[7, 18, 29, 104, 108, 122],
+	[38, 49, 124],
+	[0, 8, 50, 54, 61, 67, 82],
+	[14, 27, 88],
+	[11, 22, 33, 108, 112, 126],
+	[0, 42, 53],
+	[4, 12, 54, 58, 65, 71, 86],
+	[18, 31, 92],
+	[2, 15, 26, 37, 76, 112, 116],
+	[4, 46, 57],
+	[8, 16, 58, 62, 69, 75, 90],
+	[22, 35, 96],
+	[6, 19, 30, 41, 80, 116, 120],
+	[8, 50, 61],
+	[12, 20, 62, 66, 73, 79, 94],
+	[26, 39, 100],
+	[10, 23, 34, 45, 84, 120, 124],
+	[12, 54, 65],
+	[16, 24, 66, 70, 77, 83, 98],
+	[30, 43, 104],
+	[0, 14, 27, 38, 49, 88, 124],
+	[16, 58, 69],
+	[20, 28, 70, 74, 81, 87, 102],
+	[34, 47, 108],
+	[0, 4, 18, 31, 42, 53, 92],
+	[20, 62, 73],
+	[24, 32, 74, 78, 85, 91, 106],
+	[38, 51, 112],
+	[4, 8, 22, 35, 46, 57, 96],
+	[24, 66, 77],
+	[28, 36, 78, 82, 89, 95, 110],
+	[42, 55, 116],
+	[8, 12, 26, 39, 50, 61, 100],
+	[28, 70, 81],
+	[32, 40, 82, 86, 93, 99, 114],
+	[46, 59, 120],
+	[12, 16, 30, 43, 54, 65, 104],
+	[32, 74, 85],
+	[36, 90, 103, 118],
+	[50, 63, 124],
+	[16, 20, 34, 47, 58, 69, 108],
+	[36, 78, 89],
+	[40, 94, 107, 122],
+	[0, 54, 67],
+	[20, 24, 38, 51, 62, 73, 112],
+	[40, 82, 93],
+	[44, 98, 111, 126],
+	[4, 58, 71],
+	[24, 28, 42, 55, 66, 77, 116],
+	[44, 86, 97],
+	[2, 48, 102, 115],
+	[8, 62, 75],
+	[28, 32, 46, 59, 70, 81, 120],
+	[48, 90, 101],
+	[6, 52, 106, 119],
+	[12, 66, 79],
+	[32, 36, 50, 63, 74, 85, 124],
+	[52, 94, 105],
+	[10, 56, 110, 123],
+	[16, 70, 83],
+	[0, 36, 40, 54, 67, 78, 89],
+	[56, 98, 109],
+	[14, 60, 114, 127],
+	[20, 74, 87],
+	[4, 40, 44, 58, 71, 82, 93],
+	[60, 102, 113],
+	[3, 18, 72, 114, 118, 125],
+	[24, 78, 91],
+	[8, 44, 48, 62, 75, 86, 97],
+	[64, 106, 117],
+	[1, 7, 22, 76, 118, 122],
+	[28, 82, 95],
+	[12, 48, 52, 66, 79, 90, 101],
+	[68, 110, 121],
+	[5, 11, 26, 80, 122, 126],
+	[32, 86, 99],
+]
+
+# The following table is necessary for the non-bitslice decryption.
+lt_table_inverse = [
+	[53, 55, 72],
+	[1, 5, 20, 90],
+	[15, 102],
+	[3, 31, 90],
+	[57, 59, 76],
+	[5, 9, 24, 94],
+	[19, 106],
+	[7, 35, 94],
+	[61, 63, 80],
+	[9, 13, 28, 98],
+	[23, 110],
+	[11, 39, 98],
+	[65, 67, 84],
+	[13, 17, 32, 102],
+	[27, 114],
+	[1, 3, 15, 20, 43, 102],
+	[69, 71, 88],
+	[17, 21, 36, 106],
+	[1, 31, 118],
+	[5, 7, 19, 24, 47, 106],
+	[73, 75, 92],
+	[21, 25, 40, 110],
+	[5, 35, 122],
+	[9, 11, 23, 28, 51, 110],
+	[77, 79, 96],
+	[25, 29, 44, 114],
+	[9, 39, 126],
+	[13, 15, 27, 32, 55, 114],
+	[81, 83, 100],
+	[1, 29, 33, 48, 118],
+	[2, 13, 43],
+	[1, 17, 19, 31, 36, 59, 118],
+	[85, 87, 104],
+	[5, 33, 37, 52, 122],
+	[6, 17, 47],
+	[5, 21, 23, 35, 40, 63, 122],
+	[89, 91, 108],
+	[9, 37, 41, 56, 126],
+	[10, 21, 51],
+	[9, 25, 27, 39, 44, 67, 126],
+	[93, 95, 112],
+	[2, 13, 41, 45, 60],
+	[14, 25, 55],
+	[2, 13, 29, 31, 43, 48, 71],
+	[97, 99, 116],
+	[6, 17, 45, 49, 64],
+	[18, 29, 59],
+	[6, 17, 33, 35, 47, 52, 75],
+	[101, 103, 120],
+	[10, 21, 49, 53, 68],
+	[22, 33, 63],
+	[10, 21, 37, 39, 51, 56, 79],
+	[105, 107, 124],
+	[14, 25, 53, 57, 72],
+	[26, 37, 67],
+	[14, 25, 41, 43, 55, 60, 83],
+	[0, 109, 111],
+	[18, 29, 57, 61, 76],
+	[30, 41, 71],
+	[18, 29, 45, 47, 59, 64, 87],
+	[4, 113, 115],
+	[22, 33, 61, 65, 80],
+	[34, 45, 75],
+	[22, 33, 49, 51, 63, 68, 91],
+	[8, 117, 119],
+	[26, 37, 65, 69, 84],
+	[38, 49, 79],
+	[26, 37, 53, 55, 67, 72, 95],
+	[12, 121, 123],
+	[30, 41, 69, 73, 88],
+	[42, 53, 83],
+	[30, 41, 57, 59, 71, 76, 99],
+	[16, 125, 127],
+	[34, 45, 73, 77, 92],
+	[46, 57, 87],
+	[34, 45, 61, 63, 75, 80, 103],
+	[1, 3, 20],
+	[38, 49, 77, 81, 96],
+	[50, 61, 91],
+	[38, 49, 65, 67, 79, 84, 107],
+	[5, 7, 24],
+	[42, 53, 81, 85, 100],
+	[54, 65, 95],
+	[42, 53, 69, 71, 83, 88, 111],
+	[9, 11, 28],
+	[46, 57, 85, 89, 104],
+	[58, 69, 99],
+	[46, 57, 73, 75, 87, 92, 115],
+	[13, 15, 32],
+	[50, 61, 89, 93, 108],
+	[62, 73, 103],
+	[50, 61, 77, 79, 91, 96, 119],
+	[17, 19, 36],
+	[54, 65, 93, 97, 112],
+	[66, 77, 107],
+	[54, 65, 81, 83, 95, 100, 123],
+	[21, 23, 40],
+	[58, 69, 97, 101, 116],
+	[70, 81, 111],
+	[58, 69, 85, 87, 99, 104, 127],
+	[25, 27, 44],
+	[62, 73, 101, 105, 120],
+	[74, 85, 115],
+	[3, 62, 73, 89, 91, 103, 108],
+	[29, 31, 48],
+	[66, 77, 105, 109, 124],
+	[78, 89, 119],
+	[7, 66, 77, 93, 95, 107, 112],
+	[33, 35, 52],
+	[0, 70, 81, 109, 113],
+	[82, 93, 123],
+	[11, 70, 81, 97, 99, 111, 116],
+	[37, 39, 56],
+	[4, 74, 85, 113, 117],
+	[86, 97, 127],
+	[15, 74, 85, 101, 103, 115, 120],
+	[41, 43, 60],
+	[8, 78, 89, 117, 121],
+	[3, 90],
+	[19, 78, 89, 105, 107, 119, 124],
+	[45, 47, 64],
+	[12, 82, 93, 121, 125],
+	[7, 94],
+	[0, 23, 82, 93, 109, 111, 123],
+	[49, 51, 68],
+	[1, 16, 86, 97, 125],
+	[11, 98],
+	[4, 27, 86, 97, 113, 115, 127],
+]
+
+# =====================================================================================================================
+
+# Takes a 128-bit text and 256-bit user key, returns 128-bit cipher bytes
+# Uses the packed table engine below, which gives the same output as encrypt_reference
+def encrypt(plain_text, user_key):
+	return encrypt_block(plain_text, expand_key(user_key))
+
+# Takes a 128-bit encrypted text and 256-bit user key, returns 128-bit decoded bytes
+def decrypt(cipher_text, user_key):
+	return decrypt_block(cipher_text, expand_key(user_key))
+
+# Takes any number of bytes and a 256-bit user key (or SerpentKey), returns every 16 byte block of it encrypted on its
+# own as bytes (a partial block at the end is padded with 0s). Much faster than encrypt_block for many blocks.
+def encrypt_blocks(data, user_key):
+	return _crypt_blocks(encrypt_words, data, expand_key(user_key).k_hat)
+
+# The opposite of encrypt_blocks
+def decrypt_blocks(data, user_key):
+	return _crypt_blocks(decrypt_words, data, expand_key(user_key).k_hat)
+
+# Same as encrypt, but with a key that has already been expanded (see expand_key)
+def encrypt_block(plain_text, key):
+	return packed_block(encrypt_packed(block_packed(plain_text), key.k_packed))
+
+# Same as decrypt, but with a key that has already been expanded (see expand_key)
+def decrypt_block(cipher_text, key):
+	return packed_block(decrypt_packed(block_packed(cipher_text), key.k_packed))
+
+# =====================================================================================================================
+
+# Key schedule context
+class SerpentKey:
+	# Holds the expanded key schedule of one user key so it can be reused for every block
+	def __init__(self, user_key):
+		self.key = key_bytes(user_key) # 32 bytes of key material
+		# Round keys in bitslice form (k_hat without the initial permutation). Decryption walks the same list
+		# backwards, so there is no separate inverse schedule to keep around.
+		self.k_hat = make_subkey_words(self.key)
+		# The same round keys after the initial permutation, as 128-bit ints for the packed engine
+		self.k_packed = [block_packed(struct.pack("<4I", *k)) for k in self.k_hat]
+	
+	def encrypt_block(self, plain_text):
+		return encrypt_block(plain_text, self)
+	
+	def decrypt_block(self, cipher_text):
+		return decrypt_block(cipher_text, self)
+
+# Returns the SerpentKey for a user key, expanding it only the first time that key material is seen
+def expand_key(user_key):
+	if isinstance(user_key, SerpentKey):
+		return user_key
+	return _expand_key_bytes(key_bytes(user_key))
+
+# Cache keyed by the normalized 32 bytes, so e.g. every int key (which are all null bytes) shares one entry
+@functools.lru_cache(maxsize=256)
+def _expand_key_bytes(key):
+	return SerpentKey(key)
+
+def _crypt_blocks(function, data, k):
+	# Runs encrypt_words or decrypt_words over all blocks of a batch at once: the blocks become a (n, 4) array of
+	# words and every word of the bitslice engine is a column of it, so every S-box and rotation is one NumPy operation
+	data = np.frombuffer(data, dtype=np.uint8)
+	if not len(data) % 16 == 0:
+		data = np.concatenate([data, np.zeros(16 - len(data) % 16, dtype=np.uint8)])
+	words = data.view("<u4").reshape(-1, 4)
+	
+	result = np.empty_like(words)
+	for i in range(0, len(words), BATCH_BLOCKS):
+		x = words[i : i+BATCH_BLOCKS].T.astype(np.uint32)
+		result[i : i+BATCH_BLOCKS] = np.stack(function((x[0], x[1], x[2], x[3]), k), axis=1)
+	return result.tobytes()
+
+# =====================================================================================================================
+
+# Reference implementation working on bitstrings, kept for cross-checking the word-based engine
+
+# Takes a 128-bit text and 256-bit user key, returns 128-bit cipher bitstring
+def encrypt_reference(plain_text, user_key):
+	# Convert inputs to bitstrings
+	plain_text = str_bitstring(plain_text, 128)
+	user_key = str_bitstring(user_key, 256)
+	
+	# Get subkeys from user key
+	k_hat = make_subkeys(user_key)
+	
+	# Encrypt input
+	b_hat = ip(plain_text)
+	for i in range(ROUNDS):
+		b_hat = apply_round(i, b_hat, k_hat)
+	
+	# Apply final permutation to encrypted
+	cipher_text = fp(b_hat)
+	
+	# Convert encrypted bitstring into actual bytes
+	# cipher_bytes = bytearray()
+	# for i in range(0, len(cipher_text), 8):
+	# 	cipher_bytes.append(int(cipher_text[i:i+8], 2))
+	# return cipher_bytes
+	return reverse_str_bitstring(cipher_text)
+
+# Takes a 128-bit encrypted text and 256-bit user key, returns 128-bit decoded string
+def decrypt_reference(cipher_text, user_key):
+	# Convert inputs to bitstrings
+	cipher_text = str_bitstring(cipher_text, 128)
+	user_key = str_bitstring(user_key, 256)
+
+	k_hat = make_subkeys(user_key)
+
+	b_hat = fp_inverse(cipher_text) # b_hat_r at this stage
+	for i in range(ROUNDS-1, -1, -1): # from rounds-1 down to 0 included
+		b_hat = round_inverse(i, b_hat, k_hat) # Produce b_hat_i from b_hat_i+1
+	# b_hat is now _0
+	plain_text = ip_inverse(b_hat)
+
+	# Convert plain text bitstring to bytes
+	# return_bytes = bytearray()
+	# for i in range(0, len(plain_text), 8):
+	# 	return_bytes.append(int(plain_text[i:i+8], 2))
+	# return return_bytes
+	return reverse_str_bitstring(plain_text)
+
+# =====================================================================================================================
+
+def make_subkeys(user_key):
+	# Turn key into 32-bit words
+	# Start with prekeys -8..-1
+	# Note: w-8 is least significant word
+	w = {}
+	for i in range(-8, 0):
+		w[i] = user_key[(i+8)*32:(i+9)*32]
+	# Expand to prekeys 0..131
+	for i in range(132):
+		w[i] = rotate_left(xor(w[i-8], w[i-5], w[i-3], w[i-1], bitstring(PHI, 32), bitstring(i, 32)), 11)
+	
+	# Calculate round keys
+	k = {}
+	for i in range(ROUNDS + 1):
+		s = (ROUNDS + 3 - i) % ROUNDS # whichS in reference
+		
+		k[0+4*i] = ""
+		k[1+4*i] = ""
+		k[2+4*i] = ""
+		k[3+4*i] = ""
+		
+		for j in range(32): # for every bit in the k and w words
+			# Note: w0 and k0 are the least significant words, w99 and k99 the most.
+			inp = w[0+4*i][j] + w[1+4*i][j] + w[2+4*i][j] + w[3+4*i][j]
+			output = s_box(s, inp)
+			for l in range(4):
+				k[l+4*i] = k[l+4*i] + output[l]
+	
+	# Transform into 128-bit values
+	K = []
+	for i in range(33):
+		# Note: k4i is the least significant word, k4i+3 the most.
+		K.append(k[4*i] + k[4*i+1] + k[4*i+2] + k[4*i+3])
+	
+	# Apply initial permutation
+	k_hat = []
+	for i in range(33):
+		k_hat.append(ip(K[i]))
+	
+	return k_hat
+
+# =====================================================================================================================
+
+def rotate_left(arr, pos):
+	p = pos % len(arr)
+	return arr[-p:] + arr[:-p]
+
+def xor(*args):
+	# Binary XOR on string of "0"s and "1"s
+	result = args[0]
+	for arg in args[1:]:
+		new_result = ""
+		for i in range(len(arg)):
+			new_result += "0" if result[i] == arg[i] else "1"
+		result = new_result
+	
+	return result
+
+def bitstring(n, l):
+	# Convert num to bitstring
+	
+	if l < 1:
+		# Must have at least 1 character in a bitstring
+		raise ValueError("a bitstring must have at least 1 char")
+	if n < 0:
+		# Only works with positive ints
+		raise ValueError("bitstring representation undefined for neg numbers")
+	
+	# Convert num to bitstring
+	result = ""
+	while n > 0:
+		result += "0" if n & 1 == 0 else "1"
+		n >>= 1
+	
+	# Pad with 0s to fill rest of space if necessary
+	if len(result) < l:
+		result = result + ("0" * (l - len(result)))
+	
+	return result
+
+def str_bitstring(s, l):
+	# Convert str to bitstring if it is a string (otherwise it is probably bytes, make sure it's a bytearray)
+	b = bytearray(s.encode("utf-8")) if isinstance(s, str) else bytearray(s)
+	
+	# Convert bytearray to actual 0's and 1's
+	result = ""
+	for byte in b:
+		result += bitstring(byte, 8)
+	
+	# Pad with 0s to fill rest of space if necessary
+	if len(result) < l:
+		result = result + "0" * (l - len(result))
+	
+	return result
+
+def reverse_bitstring(s):
+	# Convert bitstring to num
+	ls = list(s)
+	result = 0
+	while len(ls) > 0:
+		result <<= 1
+		result |= 0 if ls.pop() == "0" else 1
+	return result
+
+def reverse_str_bitstring(s):
+	# Convert bytearray to literal bytes
+	result = bytearray()
+	for i in range(0, len(s), 8):
+		result.append(reverse_bitstring(s[i:i+8]))
+	
+	return result
+
+# =====================================================================================================================
+
+def apply_permutation(table, inp):
+	# Check to make sure input and table lengths match
+	if len(inp) != len(table):
+		raise ValueError("input size (%d) doesn't match perm table size (%d)" % (len(inp), len(table)))
+	
+	# Apply permutations
+	result = ""
+	for i in range(len(table)):
+		result += inp[table[i]]
+	
+	return result
+
+def ip(input):
+	# Initial permutation
+	return apply_permutation(ip_table, input)
+
+def fp(input):
+	# Final permutation
+	return apply_permutation(fp_table, input)
+
+def ip_inverse(output):
+	# Reverse initial permutation
+	return fp(output)
+
+def fp_inverse(output):
+	# Reverse final permutation
+	return ip(output)
+
+def lt(inp):
+	# Table-based linear transformation
+	
+	# Check for invalid length
+	if len(inp) != 128:
+		raise ValueError("input to lt is not 128 bit long")
+	
+	# Apply transformation
+	result = ""
+	for i in range(len(lt_table)):
+		outputBit = "0"
+		for j in lt_table[i]:
+			outputBit = xor(outputBit, inp[j])
+		result = result + outputBit
+	return result
+
+def lt_inverse(output):
+	# Inverse table-based linear transform
+	
+	# Check for invalid length
+	if len(output) != 128:
+		raise ValueError("input to inverse lt is not 128 bit long")
+	
+	# Apply inverse transformation
+	result = ""
+	for i in range(len(lt_table_inverse)):
+		inputBit = "0"
+		for j in lt_table_inverse[i]:
+			inputBit = xor(inputBit, output[j])
+		result = result + inputBit
+	return result
+
+# =====================================================================================================================
+
+def apply_round(i, b_hati, k_hat):
+	xored = xor(b_hati, k_hat[i])
+	
+	s_hat_i = s_hat(i, xored)
+	
+	b_hat_i_plus_1 = None
+	if 0 <= i <= ROUNDS-2:
+		b_hat_i_plus_1 = lt(s_hat_i)
+	elif i == ROUNDS-1:
+		b_hat_i_plus_1 = xor(s_hat_i, k_hat[ROUNDS])
+	else:
+		raise ValueError("round %d is out of 0..%d range" % (i, ROUNDS-1))
+	
+	return b_hat_i_plus_1
+
+def round_inverse(i, b_hat_i_plus_1, k_hat):
+	# Error checking
+	if 0 <= i <= ROUNDS-2:
+		s_hat_i = lt_inverse(b_hat_i_plus_1)
+	elif i == ROUNDS-1:
+		s_hat_i = xor(b_hat_i_plus_1, k_hat[ROUNDS])
+	else:
+		raise ValueError("round %d is out of 0..%d range" % (i, ROUNDS-1))
+	
+	# inverse s_hat
+	xored = s_hat_inverse(i, s_hat_i)
+	
+	# Xor with k_hat
+	b_hati = xor(xored, k_hat[i])
+	
+	return b_hati
+
+def s_box(box, inp):
+	# Apply S-box to string
+	return s_box_bitstring[box%8][inp]
+
+def s_box_inverse(box, output):
+	return s_box_bitstring_inverse[box%8][output]
+
+def s_hat(box, inp):
+	# Apply S-boxes to bitstrings
+	result = ""
+	for i in range(32):
+		result = result + s_box(box, inp[4*i:4*(i+1)])
+	return result
+
+def s_hat_inverse(box, output):
+	result = ""
+	for i in range(32):
+		result = result + s_box_inverse(box, output[4*i:4*(i+1)])
+	return result
+
+# =====================================================================================================================
+
+# Word-based engine
+# This is the bitslice form described in the Serpent paper: the 128-bit block is kept as four 32-bit words (x0 being
+# the least significant) and every S-box is applied to all 32 nibble columns at once using boolean operations. This is
+# equivalent to ip -> rounds -> fp on bitstrings, so no permutations are needed at all.
+# Everything here only uses ^, &, |, << and >>, so the words can also be uint32 arrays holding many blocks (see
+# encrypt_blocks).
+
+MASK = 0xffffffff # 32-bit word mask
+
+def key_bytes(user_key):
+	# Turn a user key into exactly 32 bytes the same way str_bitstring does (str is UTF-8, ints give that many null
+	# bytes, short keys are padded with 0s and anything past 256 bits is never read by the key schedule)
+	b = user_key.encode("utf-8") if isinstance(user_key, str) else bytes(user_key)
+	return b[:32].ljust(32, b"\x00")
+
+def block_words(block):
+	# Turn a block of up to 16 bytes into four little-endian words (short blocks are padded with 0s)
+	b = block.encode("utf-8") if isinstance(block, str) else bytes(block)
+	if len(b) > 16:
+		raise ValueError("input size (%d) doesn't match perm table size (%d)" % (len(b) * 8, 128))
+	return struct.unpack("<4I", b.ljust(16, b"\x00"))
+
+def make_subkey_words(key):
+	# Same schedule as make_subkeys, but on words and without the initial permutation (returns 33 tuples of 4 words)
+	# Prekeys -8..-1 go in front so that w[i] is prekey i-8
+	w = list(struct.unpack("<8I", key))
+	for i in range(132):
+		t = w[i] ^ w[i+3] ^ w[i+5] ^ w[i+7] ^ PHI ^ i
+		w.append(((t << 11) | (t >> 21)) & MASK)
+	
+	# Round keys
+	return [s_words[(ROUNDS + 3 - i) % 8](*w[8+4*i:12+4*i]) for i in range(ROUNDS + 1)]
+
+def encrypt_words(x, k):
+	# Encrypt a block of four words with round key words k (from make_subkey_words)
+	x0, x1, x2, x3 = x
+	for i in range(ROUNDS - 1):
+		ki = k[i]
+		x0, x1, x2, x3 = s_words[i % 8](x0 ^ ki[0], x1 ^ ki[1], x2 ^ ki[2], x3 ^ ki[3])
+		
+		# Linear transformation
+		x0 = ((x0 << 13) | (x0 >> 19)) & MASK
+		x2 = ((x2 << 3) | (x2 >> 29)) & MASK
+		x1 = x1 ^ x0 ^ x2
+		x3 = x3 ^ x2 ^ ((x0 << 3) & MASK)
+		x1 = ((x1 << 1) | (x1 >> 31)) & MASK
+		x3 = ((x3 << 7) | (x3 >> 25)) & MASK
+		x0 = x0 ^ x1 ^ x3
+		x2 = x2 ^ x3 ^ ((x1 << 7) & MASK)
+		x0 = ((x0 << 5) | (x0 >> 27)) & MASK
+		x2 = ((x2 << 22) | (x2 >> 10)) & MASK
+	
+	# Last round replaces the linear transformation with another key mix
+	ki = k[ROUNDS - 1]
+	x0, x1, x2, x3 = s_words[(ROUNDS - 1) % 8](x0 ^ ki[0], x1 ^ ki[1], x2 ^ ki[2], x3 ^ ki[3])
+	ki = k[ROUNDS]
+	return x0 ^ ki[0], x1 ^ ki[1], x2 ^ ki[2], x3 ^ ki[3]
+
+def decrypt_words(x, k):
+	# Decrypt a block of four words with round key words k (from make_subkey_words)
+	x0, x1, x2, x3 = x
+	
+	# Undo last round
+	ki = k[ROUNDS]
+	x0, x1, x2, x3 = s_words_inverse[(ROUNDS - 1) % 8](x0 ^ ki[0], x1 ^ ki[1], x2 ^ ki[2], x3 ^ ki[3])
+	ki = k[ROUNDS - 1]
+	x0, x1, x2, x3 = x0 ^ ki[0], x1 ^ ki[1], x2 ^ ki[2], x3 ^ ki[3]
+	
+	for i in range(ROUNDS - 2, -1, -1):
+		# Inverse linear transformation
+		x2 = ((x2 >> 22) | (x2 << 10)) & MASK
+		x0 = ((x0 >> 5) | (x0 << 27)) & MASK
+		x2 = x2 ^ x3 ^ ((x1 << 7) & MASK)
+		x0 = x0 ^ x1 ^ x3
+		x3 = ((x3 >> 7) | (x3 << 25)) & MASK
+		x1 = ((x1 >> 1) | (x1 << 31)) & MASK
+		x3 = x3 ^ x2 ^ ((x0 << 3) & MASK)
+		x1 = x1 ^ x0 ^ x2
+		x2 = ((x2 >> 3) | (x2 << 29)) & MASK
+		x0 = ((x0 >> 13) | (x0 << 19)) & MASK
+		
+		ki = k[i]
+		x0, x1, x2, x3 = s_words_inverse[i % 8](x0, x1, x2, x3)
+		x0, x1, x2, x3 = x0 ^ ki[0], x1 ^ ki[1], x2 ^ ki[2], x3 ^ ki[3]
+	
+	return x0, x1, x2, x3
+
+# Bitslice S-boxes
+# Each output word is the XOR of the monomials of the S-box's algebraic normal form, taken straight from
+# s_box_decimal_table (input bit 0 is x0, output bit 0 is the first returned word). MASK stands in for the constant 1.
+
+def _s0(x0, x1, x2, x3):
+	# S0 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x012 = x01 & x2
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x0 ^ x2 ^ x3 ^ x01 ^ x02 ^ x12 ^ x012 ^ x023 ^ x123,
+		MASK ^ x0 ^ x02 ^ x12 ^ x13 ^ x012 ^ x023 ^ x123,
+		x1 ^ x3 ^ x01 ^ x02 ^ x13 ^ x012 ^ x123,
+		x0 ^ x1 ^ x2 ^ x3 ^ x03,
+	)
+
+def _s1(x0, x1, x2, x3):
+	# S1 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x0 ^ x1 ^ x12 ^ x03 ^ x23 ^ x023 ^ x123,
+		MASK ^ x0 ^ x2 ^ x3 ^ x01 ^ x02 ^ x13 ^ x013 ^ x023 ^ x123,
+		MASK ^ x1 ^ x2 ^ x3 ^ x01,
+		MASK ^ x1 ^ x3 ^ x02 ^ x03 ^ x013 ^ x023 ^ x123,
+	)
+
+def _s2(x0, x1, x2, x3):
+	# S2 in algebraic normal form
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x0 & x1 & x2
+	x013 = x0 & x1 & x3
+	x023 = x02 & x3
+	return (
+		x1 ^ x2 ^ x3 ^ x02,
+		x0 ^ x1 ^ x2 ^ x12 ^ x03 ^ x23 ^ x012 ^ x013 ^ x023,
+		x0 ^ x1 ^ x3 ^ x12 ^ x13 ^ x23 ^ x013 ^ x023,
+		MASK ^ x0 ^ x1 ^ x2 ^ x13 ^ x012,
+	)
+
+def _s3(x0, x1, x2, x3):
+	# S3 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		x0 ^ x1 ^ x3 ^ x12 ^ x03 ^ x23 ^ x023 ^ x123,
+		x0 ^ x1 ^ x02 ^ x03 ^ x23 ^ x013 ^ x023,
+		x0 ^ x2 ^ x3 ^ x01 ^ x13 ^ x012 ^ x013,
+		x0 ^ x1 ^ x2 ^ x3 ^ x01 ^ x02 ^ x23 ^ x012 ^ x023,
+	)
+
+def _s4(x0, x1, x2, x3):
+	# S4 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x1 ^ x2 ^ x3 ^ x01 ^ x03 ^ x13,
+		x0 ^ x3 ^ x02 ^ x12 ^ x13 ^ x23 ^ x023 ^ x123,
+		x0 ^ x2 ^ x01 ^ x12 ^ x13 ^ x23 ^ x012 ^ x013 ^ x123,
+		x0 ^ x1 ^ x2 ^ x12 ^ x03 ^ x13 ^ x013,
+	)
+
+def _s5(x0, x1, x2, x3):
+	# S5 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x1 & x2 & x3
+	return (
+		MASK ^ x1 ^ x2 ^ x3 ^ x01 ^ x03 ^ x13,
+		MASK ^ x0 ^ x2 ^ x3 ^ x01 ^ x13 ^ x23 ^ x013,
+		MASK ^ x1 ^ x3 ^ x02 ^ x23 ^ x013 ^ x023 ^ x123,
+		MASK ^ x0 ^ x1 ^ x2 ^ x3 ^ x03 ^ x012 ^ x023,
+	)
+
+def _s6(x0, x1, x2, x3):
+	# S6 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x0 ^ x1 ^ x2 ^ x3 ^ x02 ^ x12 ^ x012 ^ x013 ^ x123,
+		MASK ^ x1 ^ x2 ^ x03,
+		MASK ^ x0 ^ x2 ^ x01 ^ x12 ^ x13 ^ x23 ^ x012 ^ x013 ^ x123,
+		x1 ^ x2 ^ x3 ^ x01 ^ x02 ^ x23 ^ x012 ^ x123,
+	)
+
+def _s7(x0, x1, x2, x3):
+	# S7 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x2 ^ x01 ^ x03 ^ x13 ^ x23 ^ x023 ^ x123,
+		x1 ^ x2 ^ x3 ^ x01 ^ x02 ^ x12 ^ x03 ^ x013 ^ x023,
+		x0 ^ x1 ^ x2 ^ x3 ^ x03 ^ x13 ^ x012 ^ x013 ^ x123,
+		x0 ^ x1 ^ x2 ^ x02 ^ x03 ^ x012,
+	)
+
+def _s_inverse_0(x0, x1, x2, x3):
+	# Inverse S0 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x2 ^ x01 ^ x12 ^ x03 ^ x13 ^ x23 ^ x013 ^ x023 ^ x123,
+		x0 ^ x1 ^ x2 ^ x02 ^ x13 ^ x023 ^ x123,
+		MASK ^ x0 ^ x1 ^ x2 ^ x3 ^ x01,
+		MASK ^ x0 ^ x3 ^ x12 ^ x23 ^ x013 ^ x023 ^ x123,
+	)
+
+def _s_inverse_1(x0, x1, x2, x3):
+	# Inverse S1 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x012 = x01 & x2
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x0 ^ x1 ^ x01 ^ x13 ^ x012 ^ x023 ^ x123,
+		x1 ^ x2 ^ x3 ^ x03 ^ x13 ^ x012 ^ x023 ^ x123,
+		MASK ^ x0 ^ x1 ^ x3 ^ x02 ^ x12 ^ x012 ^ x023,
+		x0 ^ x2 ^ x3 ^ x13,
+	)
+
+def _s_inverse_2(x0, x1, x2, x3):
+	# Inverse S2 in algebraic normal form
+	x01 = x0 & x1
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x0 & x2 & x3
+	return (
+		x0 ^ x1 ^ x2 ^ x12 ^ x13,
+		x1 ^ x2 ^ x01 ^ x03 ^ x23 ^ x013 ^ x023,
+		MASK ^ x0 ^ x2 ^ x3 ^ x01 ^ x03 ^ x13 ^ x013 ^ x023,
+		MASK ^ x3 ^ x01 ^ x12 ^ x012 ^ x023,
+	)
+
+def _s_inverse_3(x0, x1, x2, x3):
+	# Inverse S3 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		x0 ^ x2 ^ x3 ^ x12 ^ x03 ^ x13 ^ x123,
+		x1 ^ x2 ^ x3 ^ x12 ^ x03 ^ x012 ^ x023 ^ x123,
+		x01 ^ x02 ^ x12 ^ x03 ^ x13 ^ x23 ^ x013 ^ x023,
+		x0 ^ x1 ^ x2 ^ x02 ^ x03 ^ x23 ^ x012 ^ x013,
+	)
+
+def _s_inverse_4(x0, x1, x2, x3):
+	# Inverse S4 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	return (
+		MASK ^ x0 ^ x1 ^ x2 ^ x3 ^ x03 ^ x23 ^ x013 ^ x023,
+		x2 ^ x3 ^ x01 ^ x02 ^ x03 ^ x023,
+		MASK ^ x0 ^ x1 ^ x2 ^ x3 ^ x01 ^ x02 ^ x13 ^ x012 ^ x013,
+		x1 ^ x2 ^ x01 ^ x03 ^ x23 ^ x013,
+	)
+
+def _s_inverse_5(x0, x1, x2, x3):
+	# Inverse S5 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	return (
+		x0 ^ x3 ^ x12 ^ x013,
+		x0 ^ x1 ^ x3 ^ x02 ^ x12 ^ x03 ^ x012 ^ x013,
+		x0 ^ x2 ^ x01 ^ x13 ^ x013 ^ x023,
+		MASK ^ x1 ^ x2 ^ x01 ^ x03 ^ x012,
+	)
+
+def _s_inverse_6(x0, x1, x2, x3):
+	# Inverse S6 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x0 ^ x3 ^ x01 ^ x02 ^ x12 ^ x012 ^ x013 ^ x123,
+		MASK ^ x1 ^ x2 ^ x3 ^ x02,
+		MASK ^ x0 ^ x1 ^ x12 ^ x13 ^ x23 ^ x013 ^ x123,
+		MASK ^ x1 ^ x2 ^ x3 ^ x01 ^ x12 ^ x03 ^ x23 ^ x012 ^ x013 ^ x123,
+	)
+
+def _s_inverse_7(x0, x1, x2, x3):
+	# Inverse S7 in algebraic normal form
+	x01 = x0 & x1
+	x02 = x0 & x2
+	x12 = x1 & x2
+	x03 = x0 & x3
+	x13 = x1 & x3
+	x23 = x2 & x3
+	x012 = x01 & x2
+	x013 = x01 & x3
+	x023 = x02 & x3
+	x123 = x12 & x3
+	return (
+		MASK ^ x0 ^ x1 ^ x12 ^ x13 ^ x23 ^ x013 ^ x123,
+		MASK ^ x0 ^ x2 ^ x3 ^ x12 ^ x03 ^ x13 ^ x023 ^ x123,
+		x1 ^ x3 ^ x02 ^ x23 ^ x013 ^ x023,
+		x2 ^ x01 ^ x03 ^ x13 ^ x012 ^ x013,
+	)
+
+s_words = [_s0, _s1, _s2, _s3, _s4, _s5, _s6, _s7]
+s_words_inverse = [_s_inverse_0, _s_inverse_1, _s_inverse_2, _s_inverse_3, _s_inverse_4, _s_inverse_5, _s_inverse_6, _s_inverse_7]
+
+# =====================================================================================================================
+
+# Packed table engine
+# The block is kept as one 128-bit int in the same bit order as the reference's bitstrings after the initial
+# permutation (bit n is character n), so every byte of it holds two neighbouring S-box nibbles. A whole S-box layer is
+# then one bytes.translate through a 256-byte table (s_box_bytes), and since the linear transformation is linear over
+# the bits it is the XOR of one 128-bit mask per byte, looked up in 16 tables of 256 (lt_bytes). The initial and final
+# permutations are done the same way. The mask tables are built from the reference tables by packed_tables() the first
+# time a block is packed (they take a few milliseconds, which e.g. listing an unencrypted container shouldn't pay).
+
+def block_packed(block):
+	# Turn a block of up to 16 bytes into a 128-bit int after the initial permutation (short blocks are padded with 0s)
+	b = block.encode("utf-8") if isinstance(block, str) else bytes(block)
+	if len(b) > 16:
+		raise ValueError("input size (%d) doesn't match perm table size (%d)" % (len(b) * 8, 128))
+	b = b.ljust(16, b"\x00")
+	if ip_bytes is None:
+		packed_tables()
+	t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15 = ip_bytes
+	return (t0[b[0]] ^ t1[b[1]] ^ t2[b[2]] ^ t3[b[3]] ^ t4[b[4]] ^ t5[b[5]] ^ t6[b[6]] ^ t7[b[7]]
+		^ t8[b[8]] ^ t9[b[9]] ^ t10[b[10]] ^ t11[b[11]] ^ t12[b[12]] ^ t13[b[13]] ^ t14[b[14]] ^ t15[b[15]])
+
+def packed_block(x):
+	# Apply the final permutation to a 128-bit int, returns the 16 bytes
+	b = x.to_bytes(16, "little")
+	if ip_bytes is None:
+		packed_tables()
+	t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15 = fp_bytes
+	x = (t0[b[0]] ^ t1[b[1]] ^ t2[b[2]] ^ t3[b[3]] ^ t4[b[4]] ^ t5[b[5]] ^ t6[b[6]] ^ t7[b[7]]
+		^ t8[b[8]] ^ t9[b[9]] ^ t10[b[10]] ^ t11[b[11]] ^ t12[b[12]] ^ t13[b[13]] ^ t14[b[14]] ^ t15[b[15]])
+	return bytearray(x.to_bytes(16, "little"))
+
+def encrypt_packed(x, k):
+	# Encrypt a packed block with packed round keys k (SerpentKey.k_packed)
+	t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15 = lt_bytes
+	for i in range(ROUNDS - 1):
+		# S-boxes, then the linear transformation
+		b = (x ^ k[i]).to_bytes(16, "little").translate(s_box_bytes[i % 8])
+		x = (t0[b[0]] ^ t1[b[1]] ^ t2[b[2]] ^ t3[b[3]] ^ t4[b[4]] ^ t5[b[5]] ^ t6[b[6]] ^ t7[b[7]]
+			^ t8[b[8]] ^ t9[b[9]] ^ t10[b[10]] ^ t11[b[11]] ^ t12[b[12]] ^ t13[b[13]] ^ t14[b[14]] ^ t15[b[15]])
+	
+	# Last round replaces the linear transformation with another key mix
+	b = (x ^ k[ROUNDS - 1]).to_bytes(16, "little").translate(s_box_bytes[(ROUNDS - 1) % 8])
+	return int.from_bytes(b, "little") ^ k[ROUNDS]
+
+def decrypt_packed(x, k):
+	# Decrypt a packed block with packed round keys k (SerpentKey.k_packed)
+	t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15 = lt_bytes_inverse
+	
+	# Undo last round
+	b = (x ^ k[ROUNDS]).to_bytes(16, "little").translate(s_box_bytes_inverse[(ROUNDS - 1) % 8])
+	x = int.from_bytes(b, "little") ^ k[ROUNDS - 1]
+	
+	for i in range(ROUNDS - 2, -1, -1):
+		# Inverse linear transformation, then the inverse S-boxes
+		b = x.to_bytes(16, "little")
+		x = (t0[b[0]] ^ t1[b[1]] ^ t2[b[2]] ^ t3[b[3]] ^ t4[b[4]] ^ t5[b[5]] ^ t6[b[6]] ^ t7[b[7]]
+			^ t8[b[8]] ^ t9[b[9]] ^ t10[b[10]] ^ t11[b[11]] ^ t12[b[12]] ^ t13[b[13]] ^ t14[b[14]] ^ t15[b[15]])
+		b = x.to_bytes(16, "little").translate(s_box_bytes_inverse[i % 8])
+		x = int.from_bytes(b, "little") ^ k[i]
+	
+	return x
+
+def packed_tables():
+	# Builds the mask tables of the packed engine (ip_bytes last, which is the one that gets checked)
+	global lt_bytes, lt_bytes_inverse, ip_bytes, fp_bytes
+	lt_bytes_inverse = linear_bytes(lt_table_inverse)
+	fp_bytes = linear_bytes([[i] for i in fp_table])
+	lt_bytes = linear_bytes(lt_table)
+	ip_bytes = linear_bytes([[i] for i in ip_table])
+
+def linear_bytes(table):
+	# Turn a table like lt_table (output bit i is the XOR of the input bits in table[i]) into 16 lists of 256 masks, one
+	# per input byte, so that the output is the XOR of list p at byte p of the input
+	bits = [0] * 128 # output mask of every single input bit
+	for i in range(len(table)):
+		for j in table[i]:
+			bits[j] ^= 1 << i
+	
+	result = []
+	for p in range(16):
+		masks = [0] * 256
+		for b in range(1, 256):
+			# Every byte is a smaller byte plus its lowest set bit
+			low = (b & -b).bit_length() - 1
+			masks[b] = masks[b & (b - 1)] ^ bits[8*p + low]
+		result.append(masks)
+	return result
+
+# =====================================================================================================================
+
+# Mask tables of the packed engine, built by packed_tables() the first time they are needed
+lt_bytes = None
+lt_bytes_inverse = None
+ip_bytes = None
+fp_bytes = None